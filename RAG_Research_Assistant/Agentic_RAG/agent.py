@@ -1,15 +1,43 @@
-import os
 from dotenv import load_dotenv
 from langchain import hub
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_openai import ChatOpenAI
 from langchain_community.tools.semanticscholar.tool import SemanticScholarQueryRun
 from langchain_community.utilities.semanticscholar import SemanticScholarAPIWrapper
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.memory import ConversationBufferMemory
+from instrumentation import record_stage
+from models import get_chat_model
+from dedup import deduplicate
+from vector_store import merge_papers, paper_text
 
 load_dotenv()
 
+class SemanticScholarPaperSearch(SemanticScholarQueryRun):
+    """
+    Semantic Scholar search that returns the papers themselves rather than a text summary,
+    so the agent's intermediate steps carry everything needed to store them. The agent
+    sees the same fields as JSON, with whole abstracts since those are what gets embedded.
+    """
+
+    def _run(self, query, run_manager=None):
+        wrapper = self.api_wrapper
+        results = wrapper.semanticscholar_search(
+            query,
+            limit=wrapper.load_max_docs,
+            fields=wrapper.returned_fields + ["url"]
+        )
+        return {"papers": [
+            {
+                'title': getattr(item, 'title', None),
+                'authors': [{'name': author['name']} for author in getattr(item, 'authors', None) or []],
+                'abstract': getattr(item, 'abstract', None),
+                'year': getattr(item, 'year', None),
+                'url': getattr(item, 'url', None),
+                'venue': getattr(item, 'venue', None),
+                'citationCount': getattr(item, 'citationCount', None)
+            } for item in results[:wrapper.top_k_results]
+        ]}
+
 class ResearchAssistant:
     def __init__(self, vector_store=None):
         """
@@ -18,26 +46,20 @@ class ResearchAssistant:
             vector_store (PaperVectorStore, optional): Vector database for storing papers
         """
         # Initialize LLM
-        self.llm = ChatOpenAI(
-            temperature=0,
-            model="gpt-4-turbo",
-            api_key=os.getenv('OPENAI_API_KEY')
-        )
+        self.llm = get_chat_model()
 
         # Initialize Semantic Scholar Wrapper
-        api_wrapper = SemanticScholarAPIWrapper(
-            doc_content_chars_max=1000,
-            top_k_results=5
-        )
+        api_wrapper = SemanticScholarAPIWrapper(top_k_results=5)
 
         # Tools
-        self.tools = [SemanticScholarQueryRun(api_wrapper=api_wrapper)]
+        self.tools = [SemanticScholarPaperSearch(api_wrapper=api_wrapper)]
         
         # Conversation Memory
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True,
-            input_key="input"
+            input_key="input",
+            output_key="output"
         )
 
         # Vector Store (optional)
@@ -63,21 +85,27 @@ class ResearchAssistant:
             agent=self.agent,
             tools=self.tools,
             verbose=True,
-            memory=self.memory
+            memory=self.memory,
+            # Tool results are read back from the steps to store the papers found
+            return_intermediate_steps=True
         )
         
         # Track fetched papers for the current session
         self.current_papers = []
 
-    def query(self, input_text):
+    def query(self, input_text, callbacks=None):
         """
         Process research query
         Args:
             input_text (str): User's research query
+            callbacks (list, optional): Callback handlers for this query
         Returns:
             dict: Research response and fetched papers info
         """
-        response = self.agent_executor.invoke({"input": input_text})
+        response = self.agent_executor.invoke(
+            {"input": input_text},
+            config={"callbacks": callbacks}
+        )
         
         # Extract papers from response
         papers = self._extract_papers(response)
@@ -85,7 +113,8 @@ class ResearchAssistant:
         
         # Store papers in vector database if available
         if self.vector_store and papers:
-            self.vector_store.add_papers(papers)
+            with record_stage("index_papers"):
+                self.vector_store.add_papers(papers)
             self.current_papers = papers
             papers_added = True
             
@@ -111,17 +140,21 @@ class ResearchAssistant:
             for step in response['intermediate_steps']:
                 # Check if the step contains tool output
                 if len(step) > 1 and isinstance(step[1], dict) and 'papers' in step[1]:
+                    # The API reports missing fields as None
                     for paper in step[1]['papers']:
                         papers.append({
-                            'title': paper.get('title', 'Unknown Title'),
-                            'authors': [author.get('name', 'Unknown') for author in paper.get('authors', [])],
-                            'abstract': paper.get('abstract', 'No abstract available'),
-                            'year': paper.get('year', 'Unknown'),
-                            'url': paper.get('url', ''),
-                            'venue': paper.get('venue', 'Unknown'),
-                            'citation_count': paper.get('citationCount', 0)
+                            'title': paper.get('title') or 'Unknown Title',
+                            'authors': [author.get('name') or 'Unknown' for author in paper.get('authors') or []],
+                            'abstract': paper.get('abstract') or 'No abstract available',
+                            'year': paper.get('year') or 'Unknown',
+                            'url': paper.get('url') or '',
+                            'venue': paper.get('venue') or 'Unknown',
+                            'citation_count': paper.get('citationCount') or 0
                         })
         
+        # The same paper often comes back from several searches or as near-identical versions
+        papers, _, _ = deduplicate(papers, text=paper_text, merge=merge_papers)
+        
         return papers
 
     def format_response_with_citations(self, response_text, papers):
@@ -1,6 +1,36 @@
 import streamlit as st
-from agent import ResearchAssistant
-from vector_store import PaperVectorStore
+
+# The agent (LangChain, OpenAI, Semantic Scholar) and the vector store (Chroma,
+# sentence-transformers) are loaded on the first question, not when the page is viewed
+
+@st.cache_resource
+def load_vector_store():
+    """Open the paper database once per process."""
+    from vector_store import PaperVectorStore
+    return PaperVectorStore()
+
+def get_assistant():
+    """Create this session's research assistant on first use."""
+    if 'assistant' not in st.session_state:
+        from agent import ResearchAssistant
+        st.session_state.assistant = ResearchAssistant(load_vector_store())
+    return st.session_state.assistant
+
+def display_request_breakdown(record):
+    """Show per-stage latency, tokens and cache hits for one request."""
+    with st.expander(f"Request breakdown ({record['total_seconds']:.2f}s)"):
+        rows = []
+        for stage, values in record["stages"].items():
+            tokens = record["tokens"].get(stage, {})
+            rows.append({
+                "Stage": stage,
+                "Seconds": round(values["seconds"], 3),
+                "Calls": values["calls"],
+                "Input tokens": tokens.get("input", 0),
+                "Output tokens": tokens.get("output", 0),
+                "Cache hits": record["cache_hits"].get(stage, 0)
+            })
+        st.table(rows)
 
 def main():
     st.title("🔬 Research Assistant")
@@ -13,14 +43,12 @@ def main():
     if 'context_loaded' not in st.session_state:
         st.session_state.context_loaded = False
     
-    # Initialize vector store and research assistant
-    vector_store = PaperVectorStore()
-    assistant = ResearchAssistant(vector_store)
-    
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if "metrics" in message:
+                display_request_breakdown(message["metrics"])
     
     # User input
     if prompt := st.chat_input("What would you like to research?"):
@@ -34,7 +62,12 @@ def main():
         # Get response
         with st.chat_message("assistant"):
             with st.spinner("Researching..."):
-                response_data = assistant.query(prompt)
+                from instrumentation import track_request, start_metrics_server
+                start_metrics_server(default_port=9466)
+                assistant = get_assistant()
+                
+                with track_request("agentic_research_assistant") as metrics:
+                    response_data = assistant.query(prompt, callbacks=metrics.callbacks)
                 
                 # Format response with citations and references
                 formatted_response = assistant.format_response_with_citations(
@@ -43,9 +76,14 @@ def main():
                 )
                 
                 st.markdown(formatted_response)
+                display_request_breakdown(metrics.to_dict())
           
         # Add assistant response to chat history
-        st.session_state.messages.append({"role": "assistant", "content": formatted_response})
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": formatted_response,
+            "metrics": metrics.to_dict()
+        })
 
 if __name__ == "__main__":
     st.set_page_config(page_title="Research Assistant", page_icon="🔬", layout="wide")
@@ -0,0 +1,85 @@
+"""
+Compare the quantized ONNX embedder with the PyTorch sentence-transformers one.
+
+The throughput run sends the texts from several threads at once in small calls, the
+way concurrent add/query calls reach the store, and reports sentences per second for
+each backend, after the cosine similarity of their embeddings for reference:
+
+    python bench_embeddings.py --texts 2000 --callers 1 4 16 --call-size 4 --threads 4
+
+test_onnx_parity.py asserts the parity under pytest.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from onnx_embedding import OnnxEmbeddingFunction
+
+WORDS = (
+    "transformer attention retrieval embedding graph neural network reinforcement learning "
+    "protein folding diffusion model language quantization sparse convolution benchmark "
+    "dataset evaluation robustness contrastive pretraining survey causal inference"
+).split()
+
+def sample_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        "Title: " + " ".join(rng.choices(WORDS, k=rng.randint(4, 10)))
+        + " Abstract: " + " ".join(rng.choices(WORDS, k=rng.randint(20, 150)))
+        for _ in range(count)
+    ]
+
+def parity(reference, candidate, texts):
+    """
+    Cosine similarity between the two backends' embeddings of each text
+    Returns:
+        numpy.ndarray: One similarity per text
+    """
+    a = np.asarray(reference(texts), dtype=np.float32)
+    b = np.asarray(candidate(texts), dtype=np.float32)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+def throughput(embedding_function, texts, callers, call_size):
+    """
+    Embed texts from several threads at once in calls of call_size texts
+    Returns:
+        float: Sentences per second
+    """
+    calls = [texts[i:i + call_size] for i in range(0, len(texts), call_size)]
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        start = time.perf_counter()
+        list(pool.map(embedding_function, calls))
+        return len(texts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--call-size", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--model-dir", default="onnx_model")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+    backends = {
+        "pytorch": SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2"),
+        "onnx-int8": OnnxEmbeddingFunction(model_dir=args.model_dir, num_threads=args.threads)
+    }
+
+    similarities = parity(backends["pytorch"], backends["onnx-int8"], texts[:500])
+    print(f"cosine parity over {len(similarities)} texts: min {similarities.min():.4f}, mean {similarities.mean():.4f}")
+
+    # Warm up both backends before timing
+    for embedding_function in backends.values():
+        embedding_function(texts[:32])
+
+    print(f"{'backend':>10} {'callers':>8} {'sent/s':>9}")
+    for callers in args.callers:
+        for name, embedding_function in backends.items():
+            rate = throughput(embedding_function, texts, callers, args.call_size)
+            print(f"{name:>10} {callers:>8} {rate:>9.1f}")
+
+if __name__ == "__main__":
+    main()
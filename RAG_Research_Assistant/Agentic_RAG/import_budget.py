@@ -0,0 +1,89 @@
+"""
+Check the import-time cost of the Streamlit app against a budget.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter, fails if any of the
+heavy modules that should only load on demand were imported, and fails if the total
+import time exceeds the budget:
+
+    python import_budget.py --budget-ms 1500
+
+Exits non-zero on failure so it can gate container builds. test_agentic_import_budget.py runs
+the same check under pytest.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+
+# Modules that must only be imported when their feature is used
+LAZY_MODULES = ["langchain", "langchain_openai", "openai", "chromadb", "sentence_transformers", "torch", "onnxruntime", "semanticscholar"]
+
+def profile_imports(module):
+    """
+    Import a module in a fresh interpreter with -X importtime
+    Args:
+        module (str): Module to import
+    Returns:
+        dict: Cumulative import time in microseconds for every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        # Import the app next to this script, wherever it is run from
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; only top-level entries add up to the total
+        timings[name.strip()] = (int(cumulative), not name[1:].startswith(" "))
+    return timings
+
+def check_import_budget(module="app", budget_ms=DEFAULT_BUDGET_MS):
+    """
+    Profile a module's imports and compare them with the budget
+    Args:
+        module (str): Module to import
+        budget_ms (float): Allowed total import time
+    Returns:
+        tuple: (total milliseconds, {top-level module: cumulative microseconds}, list of failures)
+    """
+    timings = profile_imports(module)
+    top_level = {name: cumulative for name, (cumulative, is_top) in timings.items() if is_top}
+    total_ms = sum(top_level.values()) / 1000
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in timings]
+    if eager:
+        failures.append(f"imported at startup but should load lazily: {', '.join(eager)}")
+    if total_ms > budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms exceeds budget of {budget_ms:.0f} ms")
+    return total_ms, top_level, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest top-level imports to list")
+    args = parser.parse_args()
+
+    total_ms, top_level, failures = check_import_budget(args.module, args.budget_ms)
+
+    print(f"Importing {args.module} took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
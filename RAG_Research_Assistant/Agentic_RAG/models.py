@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+import time
+from chromadb.api.types import EmbeddingFunction
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load testing. Each call waits for a time to first token
+    drawn from a log-normal distribution plus the time to stream its output tokens,
+    then echoes the last message. It never calls tools, so agents finish in one step.
+    """
+    latency_median: float = 0.5
+    latency_sigma: float = 0.4
+    tokens_per_second: float = 60.0
+    output_tokens: int = 150
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages):
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        words = str(messages[-1].content).split()
+        words += ["lorem"] * max(self.output_tokens - len(words), 0)
+        text = " ".join(words[:self.output_tokens])
+        delay = random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+        delay += self.output_tokens / self.tokens_per_second
+
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": prompt_tokens + self.output_tokens
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)]), delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, delay = self._reply(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, delay = self._reply(messages)
+        await asyncio.sleep(delay)
+        return result
+
+class HashingEmbeddingFunction(EmbeddingFunction):
+    """
+    Deterministic offline Chroma embedding function: words are hashed into a fixed number
+    of signed buckets and the counts L2-normalised, so texts sharing words end up close together.
+    """
+
+    def __init__(self, dimensions=384, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(hashlib.md5(word.encode()).digest()[:8], "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dimensions] += sign
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def __call__(self, input):
+        time.sleep(self.latency)
+        return [self._embed(text) for text in input]
+
+def get_chat_model():
+    """Create the chat model selected by LLM_BACKEND ("openai" or "fake")."""
+    if os.getenv("LLM_BACKEND", "openai") == "fake":
+        return FakeChatModel(
+            latency_median=float(os.getenv("FAKE_LLM_LATENCY_MEDIAN", 0.5)),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.4)),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 60)),
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", 150))
+        )
+
+    from langchain_openai import ChatOpenAI
+    from client_pool import get_async_http_client, get_http_client
+    # Pooled, rate-limited connections; retries happen in the pool, not the SDK
+    return ChatOpenAI(
+        temperature=0,
+        model="gpt-4-turbo",
+        api_key=os.getenv('OPENAI_API_KEY'),
+        http_client=get_http_client("openai"),
+        http_async_client=get_async_http_client("openai"),
+        max_retries=0
+    )
+
+def get_embedding_function():
+    """Create the Chroma embedding function selected by EMBEDDING_BACKEND ("sentence-transformers", "onnx" or "hashing")."""
+    backend = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+    if backend == "hashing":
+        # Same dimensionality as all-MiniLM-L6-v2
+        return HashingEmbeddingFunction(
+            dimensions=384,
+            latency=float(os.getenv("FAKE_EMBEDDING_LATENCY", 0.0))
+        )
+
+    if backend == "onnx":
+        # int8-quantized copy of all-MiniLM-L6-v2, exported on first use
+        from onnx_embedding import OnnxEmbeddingFunction
+        return OnnxEmbeddingFunction(
+            model_dir=os.getenv("ONNX_MODEL_DIR", "onnx_model"),
+            num_threads=int(os.getenv("ONNX_THREADS", 0)) or None,
+            max_batch_size=int(os.getenv("ONNX_MAX_BATCH_SIZE", 64)),
+            max_wait_ms=float(os.getenv("ONNX_MAX_WAIT_MS", 5))
+        )
+
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+    return SentenceTransformerEmbeddingFunction(
+        model_name="all-MiniLM-L6-v2"
+    )
@@ -0,0 +1,171 @@
+"""
+int8-quantized ONNX Runtime copy of all-MiniLM-L6-v2 for CPU embedding.
+
+The model is exported from the Hugging Face checkpoint once, dynamically quantized to
+int8 and saved with its tokenizer:
+
+    python onnx_embedding.py export --out onnx_model
+
+OnnxEmbeddingFunction then serves it as a Chroma embedding function. Calls from
+concurrent threads are queued and run together, so many small add/query calls share
+one forward pass instead of each paying for its own.
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQUENCE_LENGTH = 256
+
+def export_quantized_model(out_dir, model_name=MODEL_NAME):
+    """
+    Export a sentence-transformer checkpoint to ONNX and quantize its weights to int8
+    Args:
+        out_dir (str): Directory for model.onnx, model_int8.onnx and tokenizer.json
+        model_name (str): Hugging Face model to export
+    Returns:
+        str: Path of the quantized model
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    float_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            float_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"}
+            },
+            opset_version=14
+        )
+
+    quantized_path = os.path.join(out_dir, "model_int8.onnx")
+    quantize_dynamic(float_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+class OnnxEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function running the quantized model with ONNX Runtime.
+
+    Each call is queued for a single worker thread, which waits up to max_wait_ms for
+    other callers and runs up to max_batch_size texts in one session call. Outputs are
+    mean-pooled over the attention mask and L2-normalised, like the sentence-transformers model.
+    """
+
+    def __init__(self, model_dir="onnx_model", num_threads=None, max_batch_size=64, max_wait_ms=5.0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(model_path):
+            export_quantized_model(model_dir)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._serve, daemon=True)
+        self.worker.start()
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def _serve(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+
+            # Collect more callers until the batch is full or the window closes
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                # Sorting by length keeps padding low within each chunk
+                order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+                outputs = [
+                    self._encode([texts[i] for i in order[start:start + self.max_batch_size]])
+                    for start in range(0, len(order), self.max_batch_size)
+                ]
+                vectors = np.empty((len(texts), outputs[0].shape[1]), dtype=np.float32)
+                vectors[order] = np.concatenate(outputs)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)].tolist())
+                offset += len(request_texts)
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        future = Future()
+        self.requests.put((texts, future))
+        return future.result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="export and quantize the model")
+    export_parser.add_argument("--out", default="onnx_model")
+    export_parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+
+    path = export_quantized_model(args.out, args.model)
+    print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Embedding parity of the quantized ONNX model with PyTorch sentence-transformers."""
+import os
+import pytest
+
+MIN_COSINE = 0.98
+MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_model"))
+
+TEXTS = [
+    "Attention is all you need",
+    "Title: Dense Passage Retrieval for Open-Domain Question Answering Authors: Vladimir Karpukhin, Barlas Oguz "
+    "Abstract: Open-domain question answering relies on efficient passage retrieval to select candidate contexts.",
+    "Graph neural networks for protein structure prediction",
+    "A survey of quantization methods for efficient neural network inference on CPUs",
+    "Contrastive pretraining of text and code embeddings",
+    "What are the main approaches to retrieval-augmented generation?",
+    "Diffusion models beat GANs on image synthesis",
+    "causal inference " * 200,
+    "Übersetzung und Zusammenfassung wissenschaftlicher Artikel",
+    "x"
+]
+
+def test_onnx_embeddings_match_pytorch():
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("sentence_transformers")
+    if not os.path.exists(os.path.join(MODEL_DIR, "model_int8.onnx")):
+        pytest.skip(f"no exported model in {MODEL_DIR}; run python onnx_embedding.py export --out {MODEL_DIR}")
+
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+    from bench_embeddings import parity
+    from onnx_embedding import OnnxEmbeddingFunction
+
+    similarities = parity(
+        SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2"),
+        OnnxEmbeddingFunction(model_dir=MODEL_DIR),
+        TEXTS
+    )
+    worst = similarities.argmin()
+    assert similarities.min() >= MIN_COSINE, f"cosine {similarities[worst]:.4f} for {TEXTS[worst][:60]!r}"
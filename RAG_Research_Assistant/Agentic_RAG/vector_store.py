@@ -1,29 +1,148 @@
+import hashlib
+import heapq
 import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from dedup import SignatureIndex, deduplicate, normalize_text
+from models import get_embedding_function
+
+MISSING_VALUES = ('', 'Unknown', 'No abstract available', None)
+
+def shard_names(num_shards):
+    """Collection names for a shard count; a single shard keeps the original collection."""
+    return ["research_papers"] if num_shards == 1 else [f"research_papers_{i}" for i in range(num_shards)]
+
+def paper_text(paper):
+    """Normalised title and abstract, what near duplicates are detected on."""
+    return normalize_text(paper.get('title', ''), paper.get('abstract', ''))
+
+def merge_papers(kept, duplicate):
+    """
+    Fold a near-duplicate paper's metadata into the paper being kept
+    Args:
+        kept (dict): Paper that stays, updated in place
+        duplicate (dict): Paper being dropped
+    """
+    kept['citation_count'] = max(kept.get('citation_count') or 0, duplicate.get('citation_count') or 0)
+    for field in ('url', 'venue', 'year', 'abstract'):
+        if kept.get(field) in MISSING_VALUES and duplicate.get(field) not in MISSING_VALUES:
+            kept[field] = duplicate[field]
+    kept['authors'] = kept.get('authors', []) + [
+        author for author in duplicate.get('authors', []) if author not in kept.get('authors', [])
+    ]
+    if duplicate.get('url'):
+        kept.setdefault('duplicate_urls', []).append(duplicate['url'])
 
 class PaperVectorStore:
-    def __init__(self, persist_directory='./paper_db'):
+    def __init__(self, persist_directory='./paper_db', num_shards=None):
         """
         Initialize vector database for storing research papers
         Args:
             persist_directory (str): Path to store vector database
+            num_shards (int, optional): Number of hash-partitioned collections,
+                defaults to PAPER_SHARDS or 1 (the single research_papers collection)
         """
-        # Use Chroma's built-in embedding function
-        self.embedding_function = SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
-        
+        # Sentence-transformers by default, or the offline stand-in selected by config
+        self.embedding_function = get_embedding_function()
+
         # Initialize Chroma client
         self.client = chromadb.PersistentClient(path=persist_directory)
-        
-        # Create collection with the embedding function
-        self.collection = self.client.get_or_create_collection(
-            name="research_papers",
-            embedding_function=self.embedding_function
+
+        # Create one collection per shard with the embedding function
+        self._open_shards(num_shards or int(os.getenv('PAPER_SHARDS', 1)))
+
+        # Papers stored under a different shard count are moved into the current layout
+        if set(self._shard_names_on_disk()) - set(shard_names(self.num_shards)):
+            self.rebalance(self.num_shards)
+
+        # MinHash signatures of every stored paper, for near-duplicate checks before embedding
+        signatures_path = os.path.join(persist_directory, 'signatures.jsonl')
+        legacy_path = os.path.join(persist_directory, 'signatures.json')
+        if os.path.exists(legacy_path) and not os.path.exists(signatures_path):
+            # SignatureIndex reads the old whole-file format and rewrites it as a log
+            os.replace(legacy_path, signatures_path)
+        self.signature_index = SignatureIndex(
+            path=signatures_path,
+            threshold=float(os.getenv('DEDUP_THRESHOLD', 0.8))
         )
-    
+
+    def _open_shards(self, num_shards):
+        self.num_shards = num_shards
+        self.collections = [
+            self.client.get_or_create_collection(
+                name=name,
+                embedding_function=self.embedding_function
+            ) for name in shard_names(num_shards)
+        ]
+
+        # Shards are searched concurrently
+        self.executor = ThreadPoolExecutor(max_workers=num_shards)
+
+    def _shard_names_on_disk(self):
+        names = [getattr(collection, 'name', collection) for collection in self.client.list_collections()]
+        return [name for name in names if re.fullmatch(r'research_papers(_\d+)?', name)]
+
+    def rebalance(self, num_shards, batch_size=1000):
+        """
+        Move stored papers into the collections for a new shard count
+        Args:
+            num_shards (int): New number of shards
+            batch_size (int): Records read from a collection at a time
+        Returns:
+            int: Number of papers moved
+        """
+        old_names = self._shard_names_on_disk()
+        self.executor.shutdown(wait=False)
+        self._open_shards(num_shards)
+        targets = {collection.name: collection for collection in self.collections}
+
+        moved = 0
+        for name in old_names:
+            source = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+            offset = 0
+            while True:
+                batch = source.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+                if not batch['ids']:
+                    break
+
+                stay = 0
+                groups = {}
+                for i, paper_id in enumerate(batch['ids']):
+                    target = self._shard(paper_id).name
+                    if target == name:
+                        stay += 1
+                    else:
+                        groups.setdefault(target, []).append(i)
+
+                # Embeddings are copied over, nothing is embedded again
+                for target, rows in groups.items():
+                    targets[target].upsert(
+                        ids=[batch['ids'][i] for i in rows],
+                        embeddings=[batch['embeddings'][i] for i in rows],
+                        documents=[batch['documents'][i] for i in rows],
+                        metadatas=[batch['metadatas'][i] for i in rows]
+                    )
+                    source.delete(ids=[batch['ids'][i] for i in rows])
+                    moved += len(rows)
+
+                # Moved records are gone from the source, so only skip the ones that stayed
+                offset += stay
+
+            if name not in targets:
+                self.client.delete_collection(name)
+
+        return moved
+
+    def _paper_id(self, paper):
+        # Stable across processes, unlike hash()
+        return hashlib.md5(paper.get('title', 'Unknown Title').encode('utf-8')).hexdigest()
+
+    def _shard(self, paper_id):
+        return self.collections[zlib.crc32(paper_id.encode('utf-8')) % self.num_shards]
+
     def add_papers(self, papers: List[Dict]):
         """
         Add papers to vector database
@@ -34,30 +153,46 @@ class PaperVectorStore:
         """
         if not papers:
             return False
-            
-        ids = []
-        documents = []
-        metadatas = []
-        
+
+        # Drop near duplicates of each other and of stored papers before anything is embedded
+        papers, existing, signatures = deduplicate(
+            papers,
+            text=paper_text,
+            merge=merge_papers,
+            key=self._paper_id,
+            index=self.signature_index
+        )
+        orphaned = []
+        for paper_id, duplicates in existing.items():
+            if not self._merge_into_stored(paper_id, duplicates):
+                # Indexed but never stored; forget the signature and add the papers afresh
+                self.signature_index.remove(paper_id)
+                orphaned.extend(duplicates)
+
+        batches = {}
+
         for paper in papers:
             # Generate a unique ID
-            paper_id = str(hash(paper.get('title', 'Unknown Title')))
-            
-            # Skip if paper already exists
+            paper_id = self._paper_id(paper)
+
+            # Skip if paper already exists, indexing its signature if it predates the index
             if self._paper_exists(paper_id):
+                self.signature_index.add(paper_id, signatures[paper_id])
                 continue
-                
+
+            ids, documents, metadatas = batches.setdefault(id(self._shard(paper_id)), ([], [], []))
+
             ids.append(paper_id)
-            
+
             # Prepare document text
             document_text = (
                 f"Title: {paper.get('title', 'No Title')} "
                 f"Authors: {', '.join(paper.get('authors', []))} "
                 f"Abstract: {paper.get('abstract', 'No Abstract')}"
             )
-            
+
             documents.append(document_text)
-            
+
             # Prepare metadata
             metadata = {
                 'title': paper.get('title', 'Unknown'),
@@ -65,22 +200,69 @@ class PaperVectorStore:
                 'authors': ', '.join(paper.get('authors', [])),
                 'url': paper.get('url', ''),
                 'venue': paper.get('venue', 'Unknown'),
-                'citation_count': str(paper.get('citation_count', 0))
+                'citation_count': str(paper.get('citation_count', 0)),
+                'duplicate_urls': ', '.join(paper.get('duplicate_urls', []))
             }
-            
+
             metadatas.append(metadata)
-        
-        # Add to collection if there are new papers
-        if ids:
-            self.collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas
-            )
-            return True
-            
-        return False
-    
+
+        # Add to each shard's collection if there are new papers
+        for collection in self.collections:
+            if id(collection) in batches:
+                ids, documents, metadatas = batches[id(collection)]
+                collection.add(
+                    ids=ids,
+                    documents=documents,
+                    metadatas=metadatas
+                )
+                # Signatures are only indexed once their papers are stored
+                for paper_id in ids:
+                    self.signature_index.add(paper_id, signatures[paper_id])
+
+        self.signature_index.save()
+
+        if orphaned:
+            self.add_papers(orphaned)
+
+        return bool(batches)
+
+    def _merge_into_stored(self, paper_id, duplicates):
+        """
+        Fold near duplicates of an already stored paper into its metadata
+        Args:
+            paper_id (str): Id of the stored paper
+            duplicates (List[Dict]): Incoming papers matching it
+        Returns:
+            bool: False if the paper is not actually stored
+        """
+        shard = self._shard(paper_id)
+        stored = shard.get(ids=[paper_id])
+        if not stored['ids']:
+            return False
+
+        metadata = dict(stored['metadatas'][0])
+        paper = {
+            'url': metadata.get('url', ''),
+            'venue': metadata.get('venue', 'Unknown'),
+            'year': metadata.get('year', 'Unknown'),
+            'authors': [a for a in metadata.get('authors', '').split(', ') if a],
+            'citation_count': int(metadata.get('citation_count', '0')),
+            'duplicate_urls': [u for u in metadata.get('duplicate_urls', '').split(', ') if u]
+        }
+        for duplicate in duplicates:
+            merge_papers(paper, duplicate)
+
+        metadata.update({
+            'url': paper['url'],
+            'venue': paper['venue'],
+            'year': str(paper['year']),
+            'authors': ', '.join(paper['authors']),
+            'citation_count': str(paper['citation_count']),
+            'duplicate_urls': ', '.join(paper['duplicate_urls'])
+        })
+        shard.update(ids=[paper_id], metadatas=[metadata])
+        return True
+
     def _paper_exists(self, paper_id):
         """
         Check if a paper already exists in the database
@@ -89,12 +271,8 @@ class PaperVectorStore:
         Returns:
             bool: True if paper exists
         """
-        try:
-            self.collection.get(ids=[paper_id])
-            return True
-        except:
-            return False
-    
+        return bool(self._shard(paper_id).get(ids=[paper_id])['ids'])
+
     def search_papers(self, query: str, top_k: int = 5):
         """
         Search papers in vector database
@@ -104,25 +282,32 @@ class PaperVectorStore:
         Returns:
             List of matching papers
         """
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k
-        )
-        
-        # Process and return results
+        # Embed once and query every shard concurrently
+        query_embedding = self.embedding_function([query])[0]
+        futures = [
+            self.executor.submit(
+                collection.query,
+                query_embeddings=[query_embedding],
+                n_results=top_k
+            ) for collection in self.collections
+        ]
+
+        # Process and return results, merging the shards' top-k by distance
         matched_papers = []
-        if results['ids'] and len(results['ids'][0]) > 0:
-            for i in range(len(results['ids'][0])):
-                matched_papers.append({
-                    'id': results['ids'][0][i],
-                    'title': results['metadatas'][0][i].get('title', 'No Title'),
-                    'authors': results['metadatas'][0][i].get('authors', 'Unknown').split(', '),
-                    'year': results['metadatas'][0][i].get('year', 'Unknown'),
-                    'url': results['metadatas'][0][i].get('url', ''),
-                    'venue': results['metadatas'][0][i].get('venue', 'Unknown'),
-                    'citation_count': int(results['metadatas'][0][i].get('citation_count', '0')),
-                    'content': results['documents'][0][i],
-                    'distance': results['distances'][0][i]
-                })
-                
-        return matched_papers
\ No newline at end of file
+        for future in futures:
+            results = future.result()
+            if results['ids'] and len(results['ids'][0]) > 0:
+                for i in range(len(results['ids'][0])):
+                    matched_papers.append({
+                        'id': results['ids'][0][i],
+                        'title': results['metadatas'][0][i].get('title', 'No Title'),
+                        'authors': results['metadatas'][0][i].get('authors', 'Unknown').split(', '),
+                        'year': results['metadatas'][0][i].get('year', 'Unknown'),
+                        'url': results['metadatas'][0][i].get('url', ''),
+                        'venue': results['metadatas'][0][i].get('venue', 'Unknown'),
+                        'citation_count': int(results['metadatas'][0][i].get('citation_count', '0')),
+                        'content': results['documents'][0][i],
+                        'distance': results['distances'][0][i]
+                    })
+
+        return heapq.nsmallest(top_k, matched_papers, key=lambda paper: paper['distance'])
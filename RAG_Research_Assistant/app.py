@@ -1,15 +1,49 @@
 import streamlit as st
-from data_ingest import fetch_research_papers, manage_keywords
-from retriever import prepare_document_retrieval
-from chain_builder import create_conversation_chain
-from utils import initialize_session_state
+from data_ingest import manage_keywords
+from ingest_jobs import submit_ingestion, get_job, collect_job
+from utils import initialize_session_state, display_request_breakdown
 from dotenv import load_dotenv
 import os
-import pandas as pd
-from evaluation import run_ragas_evaluation, display_evaluation_results, save_evaluation_data
+
+# Retrieval, LLM and evaluation modules (faiss, Cohere, ragas, datasets, pandas) are
+# imported where their feature is first used, so viewing the page stays cheap.
+# Check with: python import_budget.py
 
 load_dotenv()
 
+@st.fragment(run_every=1.0)
+def show_ingestion_progress(api_key):
+    """Poll the session's background ingestion job and swap in its retriever when done."""
+    job = get_job(st.session_state.ingest_job_id)
+    if job is None:
+        return
+    
+    if job.running:
+        st.write(f"Fetching papers for: {', '.join(job.keywords)}")
+        st.progress(
+            job.indexed / job.fetched if job.fetched else 0.0,
+            text=f"Fetched {job.fetched} · Embedded {job.embedded} · Indexed {job.indexed}"
+        )
+        if st.button("Cancel", key=f"cancel_{job.id}"):
+            job.cancel()
+        return
+    
+    collect_job(job.id)
+    st.session_state.ingest_job_id = None
+    
+    if job.status == "done":
+        from chain_builder import create_conversation_chain
+        
+        # Chat keeps using the previous chain until this single assignment
+        st.session_state.llm_chain = create_conversation_chain(job.retriever, api_key)
+        st.session_state.research_papers = job.papers
+        st.session_state.ingest_notice = ("success", f"Fetched {len(job.papers)} research papers!")
+    elif job.status == "cancelled":
+        st.session_state.ingest_notice = ("info", "Paper fetch cancelled.")
+    else:
+        st.session_state.ingest_notice = ("warning", job.error)
+    st.rerun()
+
 def main():
     """Main Streamlit application."""
     st.set_page_config(page_title="Research Paper Insights", page_icon="📚")
@@ -26,25 +60,42 @@ def main():
     # Fetch and Process Papers
     col1, col2 = st.columns(2)
     with col1:
-        if st.sidebar.button("Fetch Papers", type="primary"):
-            papers = fetch_research_papers(st.session_state.keywords)
-            retriever = prepare_document_retrieval(papers)
-            
-            if retriever:
-                st.session_state.llm_chain = create_conversation_chain(retriever, api_key)
-                st.session_state.research_papers = papers
-                st.sidebar.success(f"Fetched {len(papers)} research papers!")
+        if st.sidebar.button("Fetch Papers", type="primary", disabled=st.session_state.ingest_job_id is not None):
+            if st.session_state.keywords:
+                # Fetching, embedding and indexing run in the background; chat stays on the previous index
+                st.session_state.ingest_job_id = submit_ingestion(st.session_state.keywords).id
+            else:
+                st.sidebar.warning("Please enter at least one keyword.")
     
     with col2:
         if st.sidebar.button("App Reset", type="secondary"):
+            job = collect_job(st.session_state.ingest_job_id)
+            if job:
+                job.cancel()
+            # Forget the job, so a retriever it finishes with is never swapped in
+            st.session_state.ingest_job_id = None
             st.session_state.keywords = []
             st.session_state.llm_chain = None
             st.rerun()
     
+    # Background ingestion progress and result
+    if st.session_state.ingest_job_id:
+        with st.sidebar:
+            show_ingestion_progress(api_key)
+    
+    if st.session_state.ingest_notice:
+        level, text = st.session_state.ingest_notice
+        getattr(st.sidebar, level)(text)
+        st.session_state.ingest_notice = None
+    
     # Chat Interface
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if "context_tokens" in message:
+                st.caption(f"Packed context: {message['context_tokens']} tokens")
+            if "metrics" in message:
+                display_request_breakdown(message["metrics"])
     
     if prompt := st.chat_input("Ask about the research papers..."):
         if not st.session_state.llm_chain:
@@ -57,20 +108,36 @@ def main():
             st.markdown(prompt)
         
         with st.spinner("Analyzing papers..."):
+            from context_packer import packed_token_count
+            from instrumentation import track_request, start_metrics_server
+            start_metrics_server(default_port=9465)
+            
             # Configure session for conversation
-            config = {"configurable": {"session_id": "0"}}
+            config = {"configurable": {"session_id": st.session_state.session_id}}
             
             # Invoke with full input dictionary
-            response = st.session_state.llm_chain.invoke(
-                {"input": prompt},
-                config=config
-            )["answer"]
+            with track_request("research_assistant") as metrics:
+                config["callbacks"] = metrics.callbacks
+                result = st.session_state.llm_chain.invoke(
+                    {"input": prompt},
+                    config=config
+                )
+                context_tokens = packed_token_count(result.get("context", []))
+                metrics.set_context_tokens(context_tokens)
+            response = result["answer"]
 
         
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": response,
+            "context_tokens": context_tokens,
+            "metrics": metrics.to_dict()
+        })
         
         with st.chat_message("assistant"):
             st.markdown(response)
+            st.caption(f"Packed context: {context_tokens} tokens")
+            display_request_breakdown(metrics.to_dict())
     
     # Add a tab for evaluation
     tab1, tab2 = st.tabs(["Research Paper Q&A Assistant", "System Evaluation"])
@@ -130,6 +197,7 @@ def main():
         elif eval_mode == "Upload Test Set":
             uploaded_file = st.file_uploader("Upload evaluation dataset (CSV)", type="csv")
             if uploaded_file:
+                import pandas as pd
                 df = pd.read_csv(uploaded_file)
                 if "question" in df.columns:
                     if st.button("Process Test Set"):
@@ -177,6 +245,8 @@ def main():
             # Run evaluation
             if st.button("Run Evaluation"):
                 with st.spinner("Running evaluation..."):
+                    from evaluation import run_ragas_evaluation, display_evaluation_results, save_evaluation_data
+                    
                     # Check if we have ground truths for all questions
                     if all(gt is not None for gt in st.session_state.eval_ground_truths) and len(st.session_state.eval_ground_truths) == len(st.session_state.eval_questions):
                         scores = run_ragas_evaluation(
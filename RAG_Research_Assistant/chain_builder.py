@@ -1,37 +1,107 @@
-from langchain_cohere import ChatCohere
+import os
+import re
+import threading
+from collections import OrderedDict
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains.history_aware_retriever import create_history_aware_retriever
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnableParallel
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories import ChatMessageHistory
-from prompt_templates import get_history_prompt, get_main_prompt
-from langchain_core.prompts import PromptTemplate
+from instrumentation import REWRITE_TAG
+from models import get_chat_model
+from prompt_templates import get_history_prompt, get_main_prompt, get_document_prompt
+
+# Chat histories keyed by session id; the least recently used is dropped past MAX_SESSIONS
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 1000))
+session_histories = OrderedDict()
+session_lock = threading.Lock()
+
+# Words and phrases that usually point back at an earlier turn
+FOLLOW_UP_WORDS = {
+    "it", "its", "they", "them", "their", "theirs", "he", "she", "him", "her",
+    "his", "this", "that", "these", "those", "former", "latter", "same",
+    "also", "else", "again", "above", "previous", "earlier", "mentioned"
+}
+FOLLOW_UP_PHRASES = ("what about", "how about", "tell me more", "you said", "the first", "the second", "the last")
 
 def get_session_history(session_id):
     """Manage session chat history."""
-    return ChatMessageHistory()
-
-def create_conversation_chain(retriever, api_key):
-    llm = ChatCohere(
-        api_key=api_key,
-        model="command-r-plus-08-2024",
-        max_tokens=300,
-        temperature=0.6
+    with session_lock:
+        if session_id not in session_histories:
+            session_histories[session_id] = ChatMessageHistory()
+            if len(session_histories) > MAX_SESSIONS:
+                session_histories.popitem(last=False)
+        session_histories.move_to_end(session_id)
+        return session_histories[session_id]
+
+def is_self_contained(question):
+    """Cheap local check for whether a question can be retrieved on without the chat history."""
+    text = question.lower()
+    words = re.findall(r"[a-z0-9']+", text)
+
+    # Very short questions are almost always follow-ups ("why?", "and the second one?")
+    if len(words) < 4:
+        return False
+
+    if any(phrase in text for phrase in FOLLOW_UP_PHRASES):
+        return False
+
+    return not any(word in FOLLOW_UP_WORDS for word in words)
+
+def _normalize_question(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def create_fast_history_aware_retriever(llm, retriever, prompt):
+    """
+    History-aware retriever that only pays for the question rewrite when it has to.
+
+    First turns and self-contained questions go straight to the retriever. Otherwise
+    the rewrite and a speculative retrieval on the raw question run concurrently, and
+    the speculative documents are reused when the rewrite leaves the question unchanged.
+    """
+    raw_retrieval = (lambda x: x["input"]) | retriever
+
+    speculative = RunnableParallel(
+        input=lambda x: x["input"],
+        rewritten=prompt | llm | StrOutputParser(),
+        raw_docs=raw_retrieval
     )
+
+    def pick_documents(x, config):
+        if _normalize_question(x["rewritten"]) == _normalize_question(x["input"]):
+            return x["raw_docs"]
+        return retriever.invoke(x["rewritten"], config)
+
+    return RunnableBranch(
+        (
+            lambda x: not x.get("chat_history") or is_self_contained(x["input"]),
+            raw_retrieval
+        ),
+        speculative | RunnableLambda(pick_documents)
+    ).with_config(run_name="chat_retriever_chain")
+
+def create_conversation_chain(retriever, api_key, fast_rewrite=True):
+    llm = get_chat_model(api_key)
     
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, get_history_prompt()
-    )
+    if fast_rewrite:
+        history_aware_retriever = create_fast_history_aware_retriever(
+            llm, retriever, get_history_prompt()
+        )
+    else:
+        history_aware_retriever = create_history_aware_retriever(
+            llm, retriever, get_history_prompt()
+        )
     
-    # Create a prompt that includes citation formatting
-    document_prompt = PromptTemplate.from_template(
-    "{page_content}\nCitation: {citation_id} {title} by {authors} ({year})"
-    )
+    # Tag the rewrite so instrumentation can tell its LLM calls from answer generation
+    history_aware_retriever = history_aware_retriever.with_config(tags=[REWRITE_TAG])
     
+    # Citation formatting is shared with the context packer's token accounting
     document_chain = create_stuff_documents_chain(
         llm, 
         get_main_prompt(),
-        document_prompt=document_prompt,
+        document_prompt=get_document_prompt(),
         document_separator="\n\n"
     )
     
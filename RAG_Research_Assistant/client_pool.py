@@ -0,0 +1,340 @@
+"""
+Shared, rate-limit-aware HTTP clients for the LLM and embedding providers.
+
+All chat and embedding models for a provider share one pooled httpx client, so
+connections are reused across models, sessions and threads. Every request first
+reserves capacity from the provider's token buckets, and 429 or 5xx responses are
+retried with exponential backoff that honours Retry-After. Concurrent embedding calls
+are merged into larger requests by CoalescingEmbeddings. Time spent waiting on limits,
+retries and batching is reported as queueing delay, to Prometheus and to the request's
+breakdown.
+
+Limits are read per provider ("OPENAI", "COHERE") from the environment:
+    <PROVIDER>_REQUESTS_PER_SECOND   default 5
+    <PROVIDER>_TOKENS_PER_MINUTE     default unlimited, estimated from request size
+    HTTP_MAX_CONNECTIONS             default 20
+    HTTP_MAX_RETRIES                 default 5
+
+Each app runs from its own directory, so this module is vendored into Simple_RAG,
+RAG_Research_Assistant and RAG_Research_Assistant/Agentic_RAG; keep the copies identical.
+"""
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+import httpx
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Counter, Histogram
+from instrumentation import active_metrics
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+QUEUE_SECONDS = Histogram(
+    "rag_provider_queue_seconds",
+    "Time provider requests wait on rate limits, retries and batching",
+    ["provider", "reason"]
+)
+PROVIDER_RETRIES = Counter("rag_provider_retries_total", "Provider requests retried", ["provider", "status"])
+
+# Reentrant, since building a provider's embeddings fetches its HTTP clients
+_pool_lock = threading.RLock()
+_limiters = {}
+_clients = {}
+_coalescers = {}
+
+def report_queue_delay(provider, reason, seconds):
+    """Publish a queueing delay, and add it to the active request's breakdown."""
+    QUEUE_SECONDS.labels(provider, reason).observe(seconds)
+    metrics = active_metrics.get()
+    if metrics and seconds > 0:
+        metrics.record(f"{provider}_{reason}", seconds)
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: a caller takes its tokens straight away,
+    going into debt if need be, and is told how long to wait. The same bucket can
+    then pace threads with time.sleep and tasks with asyncio.sleep.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        """
+        Take tokens from the bucket
+        Args:
+            cost (float): Tokens needed
+        Returns:
+            float: Seconds to wait before going ahead
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return max(-self.tokens / self.rate, 0.0)
+
+class ProviderLimiter:
+    """Request and token buckets for one provider, plus its retry policy."""
+
+    def __init__(self, provider, requests_per_second=5.0, tokens_per_minute=None, max_retries=5,
+                 base_delay=0.5, max_delay=30.0):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_second)
+        self.tokens = TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def reserve(self, request):
+        delay = self.requests.reserve()
+        if self.tokens:
+            # Roughly four bytes of JSON per token
+            delay = max(delay, self.tokens.reserve(len(request.content) / 4))
+        return delay
+
+    def retry_delay(self, response, attempt):
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        # Full jitter keeps retrying callers from arriving together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that paces requests through a ProviderLimiter and retries throttled ones."""
+
+    def __init__(self, limiter, transport):
+        self.limiter = limiter
+        self.transport = transport
+
+    def handle_request(self, request):
+        waited = delay = self.limiter.reserve(request)
+        time.sleep(delay)
+        for attempt in range(self.limiter.max_retries + 1):
+            response = self.transport.handle_request(request)
+            if response.status_code not in RETRY_STATUSES or attempt == self.limiter.max_retries:
+                break
+            response.read()
+            response.close()
+            PROVIDER_RETRIES.labels(self.limiter.provider, response.status_code).inc()
+            # A retry is another request against the limit too
+            delay = max(self.limiter.retry_delay(response, attempt), self.limiter.reserve(request))
+            time.sleep(delay)
+            waited += delay
+
+        report_queue_delay(self.limiter.provider, "rate_limit", waited)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Async counterpart of RateLimitedTransport, sharing the same limiter. Pooled
+    connections belong to the event loop that opened them, so each loop gets its own
+    inner transport from make_transport; a client can outlive any one asyncio.run.
+    """
+
+    def __init__(self, limiter, make_transport):
+        self.limiter = limiter
+        self.make_transport = make_transport
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._transports:
+                self._transports[loop] = self.make_transport()
+            return self._transports[loop]
+
+    async def handle_async_request(self, request):
+        transport = self._transport()
+        waited = delay = self.limiter.reserve(request)
+        await asyncio.sleep(delay)
+        for attempt in range(self.limiter.max_retries + 1):
+            response = await transport.handle_async_request(request)
+            if response.status_code not in RETRY_STATUSES or attempt == self.limiter.max_retries:
+                break
+            await response.aread()
+            await response.aclose()
+            PROVIDER_RETRIES.labels(self.limiter.provider, response.status_code).inc()
+            delay = max(self.limiter.retry_delay(response, attempt), self.limiter.reserve(request))
+            await asyncio.sleep(delay)
+            waited += delay
+
+        report_queue_delay(self.limiter.provider, "rate_limit", waited)
+        return response
+
+    async def aclose(self):
+        # Only the running loop's connections can be closed from here
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport:
+            await transport.aclose()
+
+def get_limiter(provider):
+    """The process-wide limiter for a provider, configured from the environment."""
+    with _pool_lock:
+        if provider not in _limiters:
+            prefix = provider.upper()
+            tokens_per_minute = os.getenv(f"{prefix}_TOKENS_PER_MINUTE")
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                requests_per_second=float(os.getenv(f"{prefix}_REQUESTS_PER_SECOND", 5)),
+                tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+                max_retries=int(os.getenv("HTTP_MAX_RETRIES", 5))
+            )
+        return _limiters[provider]
+
+def _limits():
+    max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+def get_http_client(provider):
+    """The pooled, rate-limited httpx.Client shared by every model for a provider."""
+    limiter = get_limiter(provider)
+    with _pool_lock:
+        if (provider, "sync") not in _clients:
+            _clients[(provider, "sync")] = httpx.Client(
+                transport=RateLimitedTransport(limiter, httpx.HTTPTransport(limits=_limits())),
+                timeout=httpx.Timeout(60.0, connect=5.0)
+            )
+        return _clients[(provider, "sync")]
+
+def get_async_http_client(provider):
+    """The pooled, rate-limited httpx.AsyncClient shared by every model for a provider."""
+    limiter = get_limiter(provider)
+    with _pool_lock:
+        if (provider, "async") not in _clients:
+            _clients[(provider, "async")] = httpx.AsyncClient(
+                transport=AsyncRateLimitedTransport(limiter, lambda: httpx.AsyncHTTPTransport(limits=_limits())),
+                timeout=httpx.Timeout(60.0, connect=5.0)
+            )
+        return _clients[(provider, "async")]
+
+class BatchMetrics:
+    """Stands in for the active request on the batcher thread, recording into every caller's metrics."""
+
+    def __init__(self, targets):
+        self.targets = targets
+
+    def record(self, stage, seconds):
+        for metrics in self.targets:
+            metrics.record(stage, seconds)
+
+class EmbeddingBatcher:
+    """
+    Queue that merges embedding calls from concurrent callers. A single worker waits up
+    to window_ms after the first call for others, then embeds up to max_batch_size
+    texts per provider request. Rate-limit and retry waits of a batch are reported to
+    each caller's request.
+    """
+
+    def __init__(self, embed, provider, window_ms=10.0, max_batch_size=96):
+        self.embed = embed
+        self.provider = provider
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._serve, daemon=True)
+        self.worker.start()
+
+    def _serve(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            started = time.perf_counter()
+            texts = [text for request_texts, _, _ in batch for text in request_texts]
+            # The transport reports its waits to active_metrics, which is this thread's own
+            callers = list(dict.fromkeys(metrics for _, _, metrics in batch if metrics))
+            token = active_metrics.set(BatchMetrics(callers) if callers else None)
+            try:
+                vectors = []
+                for start in range(0, len(texts), self.max_batch_size):
+                    vectors.extend(self.embed(texts[start:start + self.max_batch_size]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                active_metrics.reset(token)
+
+            offset = 0
+            for request_texts, future, _ in batch:
+                future.set_result((vectors[offset:offset + len(request_texts)], started))
+                offset += len(request_texts)
+
+    def __call__(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        enqueued = time.perf_counter()
+        future = Future()
+        self.requests.put((texts, future, active_metrics.get()))
+        vectors, started = future.result()
+        report_queue_delay(self.provider, "batching", started - enqueued)
+        return vectors
+
+class CoalescingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that batches concurrent embed_documents and embed_query calls
+    Args:
+        embeddings (Embeddings): Provider embeddings to call
+        provider (str): Label for the reported queueing delay
+        embed_queries (callable, optional): Embeds a list of queries in one request; defaults
+            to embed_documents, which is only right for models that embed queries and
+            documents the same way
+    """
+
+    def __init__(self, embeddings, provider, embed_queries=None, window_ms=None, max_batch_size=None):
+        window_ms = window_ms if window_ms is not None else float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 10))
+        max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 96))
+        self.embeddings = embeddings
+        self.documents = EmbeddingBatcher(embeddings.embed_documents, provider, window_ms, max_batch_size)
+        self.queries = EmbeddingBatcher(embed_queries or embeddings.embed_documents, provider, window_ms, max_batch_size)
+
+    def embed_documents(self, texts):
+        return self.documents(texts)
+
+    def embed_query(self, text):
+        return self.queries([text])[0]
+
+def get_coalescing_embeddings(provider, build):
+    """
+    The process-wide CoalescingEmbeddings for a provider
+    Args:
+        provider (str): Provider the embeddings call
+        build (callable): Returns a new CoalescingEmbeddings; only called the first time,
+            so each process runs one pair of batcher threads per provider
+    Returns:
+        CoalescingEmbeddings
+    """
+    with _pool_lock:
+        if provider not in _coalescers:
+            _coalescers[provider] = build()
+        return _coalescers[provider]
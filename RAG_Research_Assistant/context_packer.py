@@ -0,0 +1,123 @@
+import re
+from typing import List, Optional, Sequence
+import tiktoken
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.prompts import BasePromptTemplate, format_document
+
+TRIM_MARKER = " ..."
+
+try:
+    encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # The encoding file could not be loaded (e.g. offline), fall back to a word/punctuation count
+    encoding = None
+
+def count_tokens(text):
+    """Count tokens locally, without a round trip to the LLM provider."""
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+def truncate_tokens(text, max_tokens):
+    """Cut text down to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    matches = list(re.finditer(r"\w+|[^\w\s]", text))
+    return text if len(matches) <= max_tokens else text[:matches[max_tokens - 1].end()]
+
+def _shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+def drop_near_duplicates(documents, similarity_threshold=0.9):
+    """Keep the first of every group of chunks whose word-shingle Jaccard similarity exceeds the threshold."""
+    kept, kept_shingles = [], []
+    for doc in documents:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / len(shingles | other) >= similarity_threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+def _content_cap(lengths, available):
+    """Largest per-document token cap that fits the available budget, or -1 if nothing fits."""
+    if available < 0:
+        return -1
+    if sum(lengths) <= available:
+        return max(lengths, default=0)
+
+    low, high = 0, max(lengths)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if sum(min(length, mid) for length in lengths) <= available:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def pack_documents(documents, token_budget, document_prompt=None, similarity_threshold=0.9, min_doc_tokens=32):
+    """
+    Fit retrieved documents into a token budget
+    Args:
+        documents (list): Retrieved documents, most relevant first
+        token_budget (int): Maximum number of context tokens
+        document_prompt (BasePromptTemplate, optional): Prompt each document is rendered with
+        similarity_threshold (float): Jaccard similarity above which chunks count as duplicates
+        min_doc_tokens (int): Smallest content share a document may be trimmed to before
+            the least relevant documents are dropped instead
+    Returns:
+        List of packed documents, each with its token count in metadata["packed_tokens"]
+    """
+    # Order by reranker score when there is one, retrieval order otherwise
+    docs = sorted(documents, key=lambda doc: -doc.metadata.get("relevance_score", 0))
+    docs = drop_near_duplicates(docs, similarity_threshold)
+
+    # Citation lines and other per-document overhead are never trimmed
+    overheads = [count_tokens(_render(Document(page_content="", metadata=doc.metadata), document_prompt)) for doc in docs]
+    lengths = [count_tokens(doc.page_content) for doc in docs]
+
+    # Trim the longest contents evenly, and only drop documents once every share is too small
+    while docs:
+        cap = _content_cap(lengths, token_budget - sum(overheads))
+        if cap >= min_doc_tokens or cap == max(lengths):
+            break
+        docs, overheads, lengths = docs[:-1], overheads[:-1], lengths[:-1]
+
+    packed = []
+    for doc, overhead, length in zip(docs, overheads, lengths):
+        content = doc.page_content
+        if length > cap:
+            content = truncate_tokens(content, cap - count_tokens(TRIM_MARKER)) + TRIM_MARKER
+            length = cap
+        packed.append(Document(
+            page_content=content,
+            metadata={**doc.metadata, "packed_tokens": overhead + length}
+        ))
+    return packed
+
+def packed_token_count(documents):
+    """Total context tokens of documents produced by pack_documents."""
+    return sum(doc.metadata.get("packed_tokens", 0) for doc in documents)
+
+def _render(doc, document_prompt):
+    return format_document(doc, document_prompt) if document_prompt else doc.page_content
+
+class ContextPacker(BaseDocumentCompressor):
+    """Document compressor that packs retrieved documents into a token budget."""
+    token_budget: int = 2000
+    document_prompt: Optional[BasePromptTemplate] = None
+    similarity_threshold: float = 0.9
+    min_doc_tokens: int = 32
+
+    def compress_documents(self, documents: Sequence[Document], query: str, callbacks=None) -> List[Document]:
+        return pack_documents(
+            documents,
+            self.token_budget,
+            document_prompt=self.document_prompt,
+            similarity_threshold=self.similarity_threshold,
+            min_doc_tokens=self.min_doc_tokens
+        )
@@ -1,8 +1,6 @@
 # data_ingest.py
 import streamlit as st
-import feedparser
 from urllib.parse import quote
-from langchain.schema import Document
 
 def manage_keywords():
     """Manage keyword input and display in sidebar."""
@@ -37,6 +35,10 @@ def fetch_research_papers(keywords):
         st.warning("Please enter at least one keyword.")
         return None
     
+    return query_arxiv(keywords)
+
+def query_arxiv(keywords):
+    """Query the ArXiv API for papers matching all keywords, without touching the UI."""
     quoted_keywords = [quote(kw) for kw in keywords]
     query = "+AND+".join([f"abs:{quote(keyword)}" for keyword in quoted_keywords])
     
@@ -45,14 +47,37 @@ def fetch_research_papers(keywords):
         '&start=0&max_results=50&sortBy=lastUpdatedDate&sortOrder=descending'
     )
     
+    import feedparser
     feed = feedparser.parse(arxiv_url)
-    return feed.entries
+    # Versions and near-identical submissions would each be embedded and crowd the top results
+    return deduplicate_papers(feed.entries)
+
+def merge_arxiv_entries(kept, duplicate):
+    """Fold a near-duplicate entry's link and authors into the entry being kept."""
+    kept.setdefault('duplicate_links', []).append(duplicate.get('link', ''))
+    names = {author.get('name') for author in kept.get('authors', [])}
+    kept['authors'] = kept.get('authors', []) + [
+        author for author in duplicate.get('authors', []) if author.get('name') not in names
+    ]
+
+def deduplicate_papers(papers):
+    """Collapse near-duplicate ArXiv entries by MinHash similarity of title and abstract."""
+    from dedup import deduplicate, normalize_text
+    
+    unique, _, _ = deduplicate(
+        papers,
+        text=lambda paper: normalize_text(paper.get('title', ''), paper.get('summary', '')),
+        merge=merge_arxiv_entries
+    )
+    return unique
 
 def transform_papers_to_documents(papers):
     """Transform raw paper data into LangChain Documents with citation information."""
     if not papers:
         return []
     
+    from langchain_core.documents import Document
+    
     return [
         Document(
             page_content=f"Title: {paper.title}\nAbstract: {paper.summary}".lower(),
@@ -61,6 +86,7 @@ def transform_papers_to_documents(papers):
                 "title": paper.title,
                 "authors": ', '.join([author.get('name', '') for author in getattr(paper, 'authors', [])]),
                 "year": getattr(paper, 'published', '').split('-')[0] if hasattr(paper, 'published') else '',
+                "duplicate_links": ', '.join(paper.get('duplicate_links', [])),
                 "citation_id": f"[{i+1}]"
             }
         ) for i, paper in enumerate(papers)
@@ -0,0 +1,244 @@
+"""
+Near-duplicate paper detection with MinHash signatures and LSH banding.
+
+Papers are compared on their normalised title and abstract. Each text is reduced to a
+signature of minimum hashes over its word 3-grams; two signatures agree at a position
+with probability equal to the Jaccard similarity of the texts. Signatures are cut into
+bands and bucketed band by band, so a lookup only compares against papers sharing a
+bucket instead of the whole corpus.
+"""
+import json
+import os
+import random
+import re
+import threading
+import unicodedata
+import zlib
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# The log is not compacted below this many lines, however few signatures it holds
+COMPACT_MIN_LINES = 1000
+
+def normalize_text(title, abstract=""):
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", f"{title or ''} {abstract or ''}")
+    text = text.encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+def shingles(text, size=3):
+    words = text.split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+class MinHasher:
+    """MinHash over word 3-grams with num_perm universal hash functions."""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, text):
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)]
+        return [
+            min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes)
+            for a, b in self.permutations
+        ]
+
+class SignatureIndex:
+    """
+    LSH index of MinHash signatures, optionally persisted to a JSON lines log.
+
+    With 16 bands of 8 rows, pairs above roughly 0.7 similarity share a bucket with high
+    probability; candidates are then checked against the threshold on the full signature.
+
+    The log starts with the MinHash parameters and every later line adds or removes one
+    signature, so save() only appends what changed since the last save. The log is
+    rewritten from the index once it has grown to twice the number of signatures.
+    """
+
+    def __init__(self, path=None, num_perm=128, bands=16, threshold=0.8, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.path = path
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+        self.signatures = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+        # Log entries not yet written, and lines in the file; None forces a rewrite
+        self._pending = []
+        self._log_lines = None
+
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path):
+        with open(path) as f:
+            header = json.loads(f.readline())
+            if header["num_perm"] != self.hasher.num_perm or header["seed"] != self.seed:
+                raise ValueError(f"{path} was built with different MinHash parameters")
+
+            if "signatures" in header:
+                # A whole-index JSON file from before the log; rewritten as a log on the next save
+                for key, signature in header["signatures"].items():
+                    self._insert(key, signature)
+                return
+
+            lines = 1
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A write cut short at the end of the log; appending after it would
+                    # corrupt the next entry, so the log is rewritten on the next save
+                    return
+                lines += 1
+                if entry.get("removed"):
+                    self._discard(entry["key"])
+                else:
+                    self._insert(entry["key"], entry["signature"])
+            self._log_lines = lines
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def _insert(self, key, signature):
+        self._discard(key)
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, set()).add(key)
+
+    def find(self, signature):
+        """
+        Find the most similar indexed signature at or above the threshold
+        Returns:
+            str: Its key, or None when there is no near duplicate
+        """
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+
+        best, best_similarity = None, self.threshold
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= best_similarity:
+                best, best_similarity = key, score
+        return best
+
+    def _discard(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return False
+        for band_key in self._band_keys(signature):
+            bucket = self.buckets.get(band_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band_key]
+        return True
+
+    def add(self, key, signature):
+        with self.lock:
+            if self.signatures.get(key) == signature:
+                return
+            self._insert(key, signature)
+            self._pending.append({"key": key, "signature": signature})
+
+    def remove(self, key):
+        with self.lock:
+            if self._discard(key):
+                self._pending.append({"key": key, "removed": True})
+
+    def empty_copy(self):
+        """An in-memory index with the same MinHash and banding parameters."""
+        return SignatureIndex(
+            num_perm=self.hasher.num_perm,
+            bands=self.bands,
+            threshold=self.threshold,
+            seed=self.seed
+        )
+
+    def save(self):
+        """Append changes since the last save to the log, or compact it when it has grown too long."""
+        if not self.path:
+            return
+        with self.lock:
+            header = {"num_perm": self.hasher.num_perm, "seed": self.seed}
+            if (self._log_lines is None or not os.path.exists(self.path)
+                    or self._log_lines + len(self._pending) > max(2 * len(self.signatures), COMPACT_MIN_LINES)):
+                # Rewrite next to the log and swap it in, so a crash never loses the old one
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(json.dumps(header) + "\n")
+                    for key, signature in self.signatures.items():
+                        f.write(json.dumps({"key": key, "signature": signature}) + "\n")
+                os.replace(tmp_path, self.path)
+                self._log_lines = len(self.signatures) + 1
+            elif self._pending:
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(entry) + "\n" for entry in self._pending)
+                self._log_lines += len(self._pending)
+            self._pending = []
+
+def deduplicate(items, text, merge, key=None, index=None):
+    """
+    Collapse near-duplicate items before they are embedded
+    Args:
+        items (list): Papers in any shape
+        text (callable): Returns the normalised text an item is compared on
+        merge (callable): merge(kept, duplicate) folds a duplicate's metadata into the kept item
+        key (callable, optional): Returns the id an item is indexed under
+        index (SignatureIndex, optional): Papers stored before, only read here
+    Returns:
+        tuple: (new items with in-batch duplicates merged into them,
+                {key of an indexed item: [items that duplicate it]},
+                {key of each new item: its signature})
+        Add the new signatures to the index only once their items are stored, so a
+        failed store never leaves a signature without its record.
+    """
+    index = index if index is not None else SignatureIndex()
+    batch = index.empty_copy()
+    # Hash outside the lock, it is the expensive part
+    signatures = [index.hasher.signature(text(item)) for item in items]
+
+    unique = {}
+    existing = {}
+    with index.lock:
+        for position, (item, signature) in enumerate(zip(items, signatures)):
+            item_key = key(item) if key else str(position)
+            match = index.find(signature)
+            if match is None and item_key in index.signatures:
+                # Same id, e.g. an identical title, counts as a duplicate too
+                match = item_key
+            if match is not None:
+                existing.setdefault(match, []).append(item)
+                continue
+
+            match = batch.find(signature)
+            if match is None and item_key in batch.signatures:
+                match = item_key
+            if match is None:
+                batch.add(item_key, signature)
+                unique[item_key] = item
+            else:
+                merge(unique[match], item)
+
+    return list(unique.values()), existing, batch.signatures
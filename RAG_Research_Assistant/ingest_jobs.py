@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+RUNNING_STATUSES = ("queued", "fetching", "embedding")
+
+# Finished jobs nobody collected, e.g. because the tab was closed, are dropped after this long
+JOB_TTL_SECONDS = float(os.getenv("INGEST_JOB_TTL_SECONDS", 3600))
+
+# Ingestion runs outside the Streamlit script thread, shared by every session in the process
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INGEST_WORKERS", 2)),
+    thread_name_prefix="ingest"
+)
+jobs = {}
+jobs_lock = threading.Lock()
+
+class IngestionJob:
+    """A background fetch-embed-index run with progress counters and cancellation."""
+
+    def __init__(self, keywords):
+        self.id = uuid.uuid4().hex[:8]
+        self.keywords = list(keywords)
+        self.status = "queued"
+        self.fetched = 0
+        self.embedded = 0
+        self.indexed = 0
+        self.papers = None
+        self.retriever = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def running(self):
+        return self.status in RUNNING_STATUSES
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Ask the job to stop at the next batch boundary; a cancelled job never reports done."""
+        self._cancel_event.set()
+
+    def _progress(self, stage, count):
+        setattr(self, stage, count)
+
+    def run(self):
+        # Imported here so the page itself never pays for faiss and the embedding client
+        from data_ingest import query_arxiv
+        from retriever import build_retriever
+
+        try:
+            self.status = "fetching"
+            papers = query_arxiv(self.keywords)
+            self.fetched = len(papers)
+
+            if self.cancelled:
+                self.status = "cancelled"
+            elif not papers:
+                self.status = "failed"
+                self.error = "No papers found. Try different keywords."
+            else:
+                self.status = "embedding"
+                retriever = build_retriever(papers, progress=self._progress, cancelled=lambda: self.cancelled)
+                # Cancelling during the last batch still counts
+                if retriever is None or self.cancelled:
+                    self.status = "cancelled"
+                else:
+                    self.papers = papers
+                    self.retriever = retriever
+                    self.status = "done"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+
+def submit_ingestion(keywords):
+    """
+    Start fetching, embedding and indexing papers in the background
+    Args:
+        keywords (list): Search keywords
+    Returns:
+        IngestionJob: Handle for polling progress, cancelling and collecting the retriever
+    """
+    job = IngestionJob(keywords)
+    with jobs_lock:
+        _evict_expired()
+        jobs[job.id] = job
+    executor.submit(job.run)
+    return job
+
+def get_job(job_id):
+    """Look up a job by id, or None if it is unknown or already collected."""
+    with jobs_lock:
+        _evict_expired()
+        return jobs.get(job_id)
+
+def collect_job(job_id):
+    """Forget a finished job once its retriever has been swapped in."""
+    with jobs_lock:
+        return jobs.pop(job_id, None)
+
+def _evict_expired():
+    # Callers hold jobs_lock
+    now = time.time()
+    for job_id in [job_id for job_id, job in jobs.items() if job.finished and now - job.finished > JOB_TTL_SECONDS]:
+        del jobs[job_id]
@@ -0,0 +1,132 @@
+"""
+Drive the conversation chain at a target request rate and report throughput and tail latency.
+
+By default the chain runs fully offline on the fake chat model and hashing embeddings
+from models.py over a synthetic corpus, so no network access or API spend is needed:
+
+    python load_test.py --qps 20 --duration 30 --papers 500
+
+Pass --live to use the providers configured in the environment instead.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from feedparser import FeedParserDict
+from retriever import prepare_document_retrieval
+from chain_builder import create_conversation_chain
+
+TOPICS = [
+    "transformer", "attention", "diffusion", "retrieval", "reinforcement", "graph",
+    "contrastive", "quantization", "distillation", "federated", "robustness", "agents",
+    "speech", "vision", "multilingual", "reasoning", "alignment", "compression"
+]
+
+QUESTIONS = [
+    "What are the main findings on {topic} models?",
+    "Which papers evaluate {topic} on standard benchmarks?",
+    "How does {topic} compare with {other} approaches?",
+    "What are the limitations of them?",
+    "Tell me more about the second one."
+]
+
+def synthetic_papers(count, seed=0):
+    """Generate arXiv-like feed entries over a fixed topic vocabulary."""
+    rng = random.Random(seed)
+    papers = []
+    for i in range(count):
+        topics = rng.sample(TOPICS, 3)
+        abstract = " ".join(rng.choice(topics + TOPICS) for _ in range(rng.randint(120, 250)))
+        papers.append(FeedParserDict(
+            title=f"On {topics[0]} and {topics[1]} for {topics[2]} ({i})",
+            summary=abstract,
+            link=f"http://arxiv.org/abs/0000.{i:05d}",
+            authors=[{"name": f"Author {rng.randint(1, 200)}"} for _ in range(rng.randint(1, 4))],
+            published=f"{rng.randint(2015, 2025)}-01-01T00:00:00Z"
+        ))
+    return papers
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def run_load(chain, qps, duration, workers, sessions):
+    """
+    Send requests on an open-loop schedule at the target rate
+    Args:
+        chain: Conversation chain built by create_conversation_chain
+        qps (float): Target requests per second
+        duration (float): Seconds to keep sending requests
+        workers (int): Maximum concurrent requests
+        sessions (int): Number of conversations the requests are spread over
+    Returns:
+        dict: Throughput and latency statistics
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def send(i, scheduled):
+        topic, other = random.sample(TOPICS, 2)
+        question = random.choice(QUESTIONS).format(topic=topic, other=other)
+        config = {"configurable": {"session_id": f"load-{i % sessions}"}}
+        try:
+            chain.invoke({"input": question}, config=config)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            return
+        # Latency is measured from the scheduled send time, so queueing delay counts
+        with lock:
+            latencies.append(time.perf_counter() - scheduled)
+
+    total = int(qps * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(total):
+            scheduled = start + i / qps
+            time.sleep(max(scheduled - time.perf_counter(), 0))
+            executor.submit(send, i, scheduled)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "sent": total,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50) if latencies else None,
+        "p95": percentile(latencies, 0.95) if latencies else None,
+        "p99": percentile(latencies, 0.99) if latencies else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--papers", type=int, default=200)
+    parser.add_argument("--live", action="store_true", help="use the configured providers instead of the offline stand-ins")
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["EMBEDDING_BACKEND"] = "hashing"
+
+    retriever = prepare_document_retrieval(synthetic_papers(args.papers))
+    chain = create_conversation_chain(retriever, os.getenv("COHERE_API_KEY"))
+
+    result = run_load(chain, args.qps, args.duration, args.workers, args.sessions)
+    print(f"Sent {result['sent']} requests at {args.qps} QPS for {args.duration}s")
+    print(f"Completed {result['completed']}, errors {result['errors']}")
+    print(f"Throughput: {result['throughput']:.2f} req/s")
+    if result["completed"]:
+        print(
+            f"Latency p50 {result['p50'] * 1000:.0f} ms, "
+            f"p95 {result['p95'] * 1000:.0f} ms, p99 {result['p99'] * 1000:.0f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+import time
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load testing. Each call waits for a time to first token
+    drawn from a log-normal distribution plus the time to stream its output tokens,
+    then echoes the last message.
+    """
+    latency_median: float = 0.5
+    latency_sigma: float = 0.4
+    tokens_per_second: float = 60.0
+    output_tokens: int = 150
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        words = str(messages[-1].content).split()
+        words += ["lorem"] * max(self.output_tokens - len(words), 0)
+        text = " ".join(words[:self.output_tokens])
+        delay = random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+        delay += self.output_tokens / self.tokens_per_second
+
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": prompt_tokens + self.output_tokens
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)]), delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, delay = self._reply(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, delay = self._reply(messages)
+        await asyncio.sleep(delay)
+        return result
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic offline embeddings: words are hashed into a fixed number of signed
+    buckets and the counts L2-normalised, so texts sharing words end up close together.
+    """
+
+    def __init__(self, dimensions=384, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(hashlib.md5(word.encode()).digest()[:8], "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dimensions] += sign
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._embed(text)
+
+def get_chat_model(api_key):
+    """
+    Create the chat model selected by LLM_BACKEND ("cohere" or "fake")
+    Args:
+        api_key (str): Cohere API key, unused by the fake backend
+    Returns:
+        BaseChatModel: Chat model for the conversation chain
+    """
+    if os.getenv("LLM_BACKEND", "cohere") == "fake":
+        return FakeChatModel(
+            latency_median=float(os.getenv("FAKE_LLM_LATENCY_MEDIAN", 0.5)),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.4)),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 60)),
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", 150))
+        )
+
+    from langchain_cohere import ChatCohere
+    llm = ChatCohere(
+        api_key=api_key,
+        model="command-r-plus-08-2024",
+        max_tokens=300,
+        temperature=0.6
+    )
+    return use_shared_cohere_clients(llm, api_key)
+
+def get_embeddings():
+    """Create the embedding model selected by EMBEDDING_BACKEND ("cohere" or "hashing")."""
+    if os.getenv("EMBEDDING_BACKEND", "cohere") == "hashing":
+        # Same dimensionality as embed-english-light-v3.0
+        return HashingEmbeddings(
+            dimensions=384,
+            latency=float(os.getenv("FAKE_EMBEDDING_LATENCY", 0.0))
+        )
+
+    from langchain_cohere import CohereEmbeddings
+    from client_pool import CoalescingEmbeddings, get_coalescing_embeddings
+
+    def build():
+        embeddings = use_shared_cohere_clients(
+            # Retries happen in the pooled transport, not again in the SDK
+            CohereEmbeddings(model="embed-english-light-v3.0", max_retries=0),
+            os.getenv("COHERE_API_KEY")
+        )
+        # Cohere embeds queries and documents differently, so queries are batched as queries
+        return CoalescingEmbeddings(
+            embeddings,
+            "cohere",
+            embed_queries=lambda texts: embeddings.embed(texts, input_type="search_query")
+        )
+
+    # Every fetch job shares one wrapper, so its batcher threads are started once per process
+    return get_coalescing_embeddings("cohere", build)
+
+def use_shared_cohere_clients(model, api_key):
+    """Point a langchain_cohere model at the pooled, rate-limited HTTP clients."""
+    import cohere
+    from client_pool import get_async_http_client, get_http_client
+    
+    model.client = cohere.Client(api_key=api_key, client_name="langchain", httpx_client=get_http_client("cohere"))
+    model.async_client = cohere.AsyncClient(
+        api_key=api_key,
+        client_name="langchain",
+        httpx_client=get_async_http_client("cohere")
+    )
+    return model
@@ -1,5 +1,5 @@
 from langchain.prompts import ChatPromptTemplate
-from langchain_core.prompts import MessagesPlaceholder
+from langchain_core.prompts import MessagesPlaceholder, PromptTemplate
 
 def get_history_prompt():
     """Create prompt for history-aware retrieval."""
@@ -28,3 +28,9 @@ def get_main_prompt():
         MessagesPlaceholder("chat_history"),
         ("human", "{input}")
     ])
+
+def get_document_prompt():
+    """Create prompt for rendering a retrieved paper with its citation."""
+    return PromptTemplate.from_template(
+        "{page_content}\nCitation: {citation_id} {title} by {authors} ({year})"
+    )
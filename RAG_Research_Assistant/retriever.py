@@ -1,8 +1,13 @@
+import os
 import streamlit as st
 import faiss
-from langchain_cohere import CohereEmbeddings
 from langchain.vectorstores import FAISS
 from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.retrievers import ContextualCompressionRetriever
+from context_packer import ContextPacker
+from instrumentation import TimedEmbeddings
+from models import get_embeddings
+from prompt_templates import get_document_prompt
 from data_ingest import transform_papers_to_documents
 
 def prepare_document_retrieval(papers):
@@ -11,11 +16,26 @@ def prepare_document_retrieval(papers):
         st.warning("No papers found. Try different keywords.")
         return None
     
+    return build_retriever(papers)
+
+def build_retriever(papers, progress=None, cancelled=None, batch_size=16):
+    """
+    Embed papers and index them in FAISS, one batch at a time
+    Args:
+        papers (list): ArXiv feed entries
+        progress (callable, optional): Called as progress(stage, count) with the number of
+            papers "embedded" and "indexed" so far
+        cancelled (callable, optional): Checked between batches; when it returns True
+            the build stops and None is returned
+        batch_size (int): Papers embedded per embedding call
+    Returns:
+        Retriever over the papers, or None if the build was cancelled
+    """
     # Transform papers to LangChain documents
     documents = transform_papers_to_documents(papers)
     
     # Initialize embedding model
-    embedding_model = CohereEmbeddings(model="embed-english-light-v3.0")
+    embedding_model = TimedEmbeddings(get_embeddings())
     
     # Create FAISS index
     index = faiss.IndexFlatL2(
@@ -30,10 +50,34 @@ def prepare_document_retrieval(papers):
         index_to_docstore_id={}
     )
     
-    # Add documents to vector store
-    vector_store.add_documents(documents)
+    # Add documents to vector store in batches so progress can be reported and the build cancelled
+    for start in range(0, len(documents), batch_size):
+        if cancelled and cancelled():
+            return None
+        
+        batch = documents[start:start + batch_size]
+        texts = [doc.page_content for doc in batch]
+        vectors = embedding_model.embed_documents(texts)
+        if progress:
+            progress("embedded", start + len(batch))
+        
+        vector_store.add_embeddings(
+            list(zip(texts, vectors)),
+            metadatas=[doc.metadata for doc in batch]
+        )
+        if progress:
+            progress("indexed", start + len(batch))
     
-    return vector_store.as_retriever()
+    # Pack retrieved papers into a bounded context, trimming abstracts before dropping citations
+    context_packer = ContextPacker(
+        token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", 2000)),
+        document_prompt=get_document_prompt()
+    )
+    
+    return ContextualCompressionRetriever(
+        base_compressor=context_packer,
+        base_retriever=vector_store.as_retriever()
+    )
 
 def format_documents_with_citations(docs):
     """Format documents to include citation information."""
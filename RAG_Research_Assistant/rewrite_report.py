@@ -0,0 +1,99 @@
+"""
+Replay a recorded conversation set through the conversation chain with and without
+the fast question-rewrite path, and report median latency and LLM spend for each.
+
+Usage:
+    python rewrite_report.py rewrite_conversations.json "retrieval augmented generation" "dense retrieval"
+
+The conversations file holds a list of conversations, each a list of user questions.
+rewrite_conversations.json is a small recorded set mixing self-contained questions
+with follow-ups that need the rewrite.
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from data_ingest import fetch_research_papers
+from retriever import prepare_document_retrieval
+from chain_builder import create_conversation_chain
+
+load_dotenv()
+
+class LLMUsageCounter(BaseCallbackHandler):
+    """Count LLM calls and tokens across a replay."""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.tokens += usage.get("total_tokens", 0)
+
+def replay(chain, conversations, label):
+    """
+    Replay every conversation turn by turn
+    Args:
+        chain: Conversation chain built by create_conversation_chain
+        conversations (list): List of conversations, each a list of questions
+        label (str): Prefix for the session ids used in this replay
+    Returns:
+        dict: Per-turn latencies and LLM usage
+    """
+    counter = LLMUsageCounter()
+    latencies = []
+
+    for i, conversation in enumerate(conversations):
+        config = {
+            "configurable": {"session_id": f"{label}-{i}"},
+            "callbacks": [counter]
+        }
+        for question in conversation:
+            start = time.perf_counter()
+            chain.invoke({"input": question}, config=config)
+            latencies.append(time.perf_counter() - start)
+
+    return {
+        "median_latency": statistics.median(latencies),
+        "llm_calls": counter.calls,
+        "tokens": counter.tokens
+    }
+
+def main():
+    conversations_path, keywords = sys.argv[1], sys.argv[2:]
+    with open(conversations_path) as f:
+        conversations = json.load(f)
+
+    papers = fetch_research_papers(keywords)
+    retriever = prepare_document_retrieval(papers)
+    api_key = os.getenv("COHERE_API_KEY")
+
+    baseline = replay(create_conversation_chain(retriever, api_key, fast_rewrite=False), conversations, "baseline")
+    fast = replay(create_conversation_chain(retriever, api_key, fast_rewrite=True), conversations, "fast")
+
+    turns = sum(len(conversation) for conversation in conversations)
+    print(f"Replayed {len(conversations)} conversations ({turns} turns)")
+    for label, result in (("standard", baseline), ("fast", fast)):
+        print(
+            f"{label:>8}: median latency {result['median_latency'] * 1000:.0f} ms, "
+            f"{result['llm_calls']} LLM calls, {result['tokens']} tokens"
+        )
+
+    latency_saved = 1 - fast["median_latency"] / baseline["median_latency"]
+    calls_saved = baseline["llm_calls"] - fast["llm_calls"]
+    tokens_saved = baseline["tokens"] - fast["tokens"]
+    print(f"Median latency saved: {latency_saved:.1%}")
+    print(f"LLM calls saved: {calls_saved} ({calls_saved / max(baseline['llm_calls'], 1):.1%})")
+    print(f"Tokens saved: {tokens_saved} ({tokens_saved / max(baseline['tokens'], 1):.1%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Startup import budget for the Streamlit app; see import_budget.py."""
+import importlib.util
+import os
+import pytest
+
+def load_import_budget():
+    # Loaded by path, the Agentic_RAG app has its own import_budget.py
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.py")
+    spec = importlib.util.spec_from_file_location("research_assistant_import_budget", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_app_imports_within_budget():
+    # Importing the app needs its UI dependencies installed
+    pytest.importorskip("streamlit")
+    pytest.importorskip("dotenv")
+
+    total_ms, _, failures = load_import_budget().check_import_budget("app")
+    assert not failures, f"importing app took {total_ms:.0f} ms: " + "; ".join(failures)
@@ -1,3 +1,4 @@
+import uuid
 import streamlit as st
 
 def initialize_session_state():
@@ -7,9 +8,28 @@ def initialize_session_state():
         "llm_chain": None,
         "keywords": [],
         "research_papers": None,
-        "session_config": None
+        "session_config": None,
+        "session_id": str(uuid.uuid4()),
+        "ingest_job_id": None,
+        "ingest_notice": None
     }
     
     for key, default_value in session_state_keys.items():
         if key not in st.session_state:
-            st.session_state[key] = default_value
\ No newline at end of file
+            st.session_state[key] = default_value
+
+def display_request_breakdown(record):
+    """Show per-stage latency, tokens and cache hits for one request."""
+    with st.expander(f"Request breakdown ({record['total_seconds']:.2f}s)"):
+        rows = []
+        for stage, values in record["stages"].items():
+            tokens = record["tokens"].get(stage, {})
+            rows.append({
+                "Stage": stage,
+                "Seconds": round(values["seconds"], 3),
+                "Calls": values["calls"],
+                "Input tokens": tokens.get("input", 0),
+                "Output tokens": tokens.get("output", 0),
+                "Cache hits": record["cache_hits"].get(stage, 0)
+            })
+        st.table(rows)
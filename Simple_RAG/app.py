@@ -1,28 +1,80 @@
-import os 
+import os
+import threading
+from collections import OrderedDict
 import gradio as gr
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_chroma import Chroma
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
+from langchain.retrievers import ContextualCompressionRetriever
+from question_condenser import skip_self_contained_rewrites
+from context_packer import ContextPacker, packed_token_count
+from snapshot import SnapshotRetriever, SnapshotStore
+from sharded_store import ShardedVectorStore
+from models import get_chat_model, get_embeddings
+from instrumentation import TimedEmbeddings, track_request, start_metrics_server
 
-embeddings = OpenAIEmbeddings()
 load_dotenv(override=True)
-vector_store = Chroma(persist_directory=os.environ['db_name'], embedding_function=embeddings)
-
-def chat(message, history):
-    result = conversation_chain.invoke({"question": message})
-    return result["answer"]
 
+# Shared, thread-safe clients: one embedding client, vector store, LLM and retriever for all users
+embeddings = TimedEmbeddings(get_embeddings())
 # create a new Chat with OpenAI
-llm = ChatOpenAI(temperature=0.7, model_name=os.environ['MODEL'], api_key=os.environ['OPENAI_API_KEY'])
-# set up the conversation memory for the chat
-memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+llm = get_chat_model()
 # the retriever is an abstraction over the VectorStore that will be used during RAG
-#retriever = vector_store.as_retriever()
-retriever = vector_store.as_retriever(search_kwargs={"k": 25}) # after the search, we will rerank the results with the LLM
-# set up the conversation chain with the GPT 4o-mini LLM, the vector store and memory
-conversation_chain = ConversationalRetrievalChain.from_llm(llm=llm, retriever=retriever, memory=memory)
+if os.getenv('SNAPSHOT_DIR'):
+    # serve from a memory-mapped snapshot (see snapshot.py) instead of opening Chroma;
+    # large snapshots carry an IVF index, small ones are scanned exactly on every query
+    retriever = SnapshotRetriever(store=SnapshotStore(os.environ['SNAPSHOT_DIR']), embeddings=embeddings, k=25)
+elif os.getenv('SHARD_BY'):
+    # fan out over the shards written by data_ingestion.py with SHARD_BY set
+    vector_store = ShardedVectorStore(embeddings, persist_directory=os.environ['db_name'], partition=os.environ['SHARD_BY'], num_shards=int(os.getenv('NUM_SHARDS', 4)))
+    retriever = vector_store.as_retriever(search_kwargs={"k": 25})
+else:
+    vector_store = Chroma(persist_directory=os.environ['db_name'], embedding_function=embeddings)
+    #retriever = vector_store.as_retriever()
+    retriever = vector_store.as_retriever(search_kwargs={"k": 25}) # after the search, we will rerank the results with the LLM
+# pack the 25 chunks into a bounded context, dropping near-duplicates and trimming long chunks before dropping any
+context_packer = ContextPacker(token_budget=int(os.getenv('CONTEXT_TOKEN_BUDGET', 3000)))
+packed_retriever = ContextualCompressionRetriever(base_compressor=context_packer, base_retriever=retriever)
+
+# Per-session conversation chains, least recently used evicted first
+MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 1000))
+session_chains = OrderedDict()
+session_lock = threading.Lock()
+
+def create_session_chain():
+    # set up the conversation memory for the chat
+    memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True, output_key='answer')
+    # set up the conversation chain with the GPT 4o-mini LLM, the vector store and memory
+    conversation_chain = ConversationalRetrievalChain.from_llm(llm=llm, retriever=packed_retriever, memory=memory, return_source_documents=True)
+    # skip the condense-question LLM call for first turns and self-contained questions
+    return skip_self_contained_rewrites(conversation_chain)
+
+def get_session_chain(session_id):
+    with session_lock:
+        if session_id not in session_chains:
+            session_chains[session_id] = create_session_chain()
+            if len(session_chains) > MAX_SESSIONS:
+                session_chains.popitem(last=False)
+        session_chains.move_to_end(session_id)
+        return session_chains[session_id]
+
+def end_session(request: gr.Request):
+    with session_lock:
+        session_chains.pop(request.session_hash, None)
+
+async def chat(message, history, request: gr.Request):
+    conversation_chain = get_session_chain(request.session_hash)
+    with track_request("simple_rag") as metrics:
+        result = await conversation_chain.ainvoke({"question": message}, config={"callbacks": metrics.callbacks})
+        metrics.set_context_tokens(packed_token_count(result['source_documents']))
+    return result["answer"]
 
 #gradio ui
-view = gr.ChatInterface(chat, type="messages").launch(inbrowser=True)
+view = gr.ChatInterface(chat, type="messages", concurrency_limit=int(os.getenv('GRADIO_CONCURRENCY', 16)))
+with view:
+    view.unload(end_session)
+
+if __name__ == "__main__":
+    start_metrics_server(default_port=9464)
+    view.queue(max_size=int(os.getenv('GRADIO_QUEUE_SIZE', 128))).launch(inbrowser=True)
@@ -0,0 +1,82 @@
+"""
+Benchmark query latency of the sharded vector store as the corpus and shard count grow.
+
+Runs offline on a synthetic corpus with the hashing embeddings from models.py, each
+configuration in its own temporary Chroma database:
+
+    python bench_shards.py --sizes 10000 50000 100000 --shards 1 2 4 8 --queries 200
+"""
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from models import HashingEmbeddings
+from sharded_store import ShardedVectorStore
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+DOC_TYPES = ["products", "contracts", "company", "employees"]
+
+def synthetic_corpus(size, seed=0):
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choices(VOCABULARY, k=rng.randint(40, 120))) for _ in range(size)]
+    metadatas = [{"doc_type": rng.choice(DOC_TYPES)} for _ in range(size)]
+    return texts, metadatas
+
+def bench(size, num_shards, queries, k, batch_size=2000):
+    """
+    Build a hash-partitioned store and time queries against it
+    Returns:
+        dict: Build time and query latency statistics in milliseconds
+    """
+    texts, metadatas = synthetic_corpus(size)
+    directory = tempfile.mkdtemp(prefix="shards-")
+    try:
+        store = ShardedVectorStore(
+            HashingEmbeddings(dimensions=384),
+            persist_directory=directory,
+            partition="hash",
+            num_shards=num_shards
+        )
+        start = time.perf_counter()
+        for offset in range(0, size, batch_size):
+            store.add_texts(texts[offset:offset + batch_size], metadatas[offset:offset + batch_size])
+        build_seconds = time.perf_counter() - start
+
+        rng = random.Random(1)
+        latencies = []
+        for _ in range(queries):
+            query = " ".join(rng.choices(VOCABULARY, k=8))
+            start = time.perf_counter()
+            store.similarity_search_with_score(query, k=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+
+        return {
+            "build_seconds": build_seconds,
+            "mean": statistics.mean(latencies),
+            "p95": latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)]
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=25)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'shards':>6} {'build s':>8} {'mean ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        for num_shards in args.shards:
+            result = bench(size, num_shards, args.queries, args.k)
+            print(
+                f"{size:>8} {num_shards:>6} {result['build_seconds']:>8.1f} "
+                f"{result['mean']:>8.2f} {result['p95']:>8.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
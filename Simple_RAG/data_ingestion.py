@@ -3,8 +3,9 @@ import glob
 from dotenv import load_dotenv
 from langchain.document_loaders import DirectoryLoader, TextLoader
 from langchain.text_splitter import CharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
+from models import get_embeddings
+from sharded_store import ShardedVectorStore
 
 load_dotenv(override=True)
 os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY', 'your-key-if-not-using-env')
@@ -12,7 +13,7 @@ folders = glob.glob("knowledge-base/*")
 text_loader_kwargs = {'encoding': 'utf-8'}
 
 # Vector Embeddings
-embeddings = OpenAIEmbeddings()
+embeddings = get_embeddings()
 
 # Loading Documents
 def loader(folder):
@@ -25,6 +26,13 @@ def loader(folder):
         docs.append(doc)
     return docs
 
+def creat_sharded_vectorstore(documents, embeddings):
+    # One collection per doc_type, or NUM_SHARDS hash buckets, searched in parallel at query time
+    vectorstore = ShardedVectorStore(embeddings, persist_directory=os.environ['db_name'], partition=os.environ['SHARD_BY'], num_shards=int(os.getenv('NUM_SHARDS', 4)))
+    vectorstore.delete_all()
+    vectorstore.add_documents(documents)
+    return vectorstore
+
 def creat_vectorstore(documents, embeddings):
     # Check if a Chroma Datastore already exists - if so, deleting the collection
     if os.path.exists(os.environ['db_name']):
@@ -45,10 +53,14 @@ doc_chunks = chunking(documents)
 # Document Types
 doc_types = set(chunk.metadata['doc_type'] for chunk in doc_chunks)
 print(f"Document types found: {', '.join(doc_types)}")
-# Create the Chroma vectorstore
-vector_DB = creat_vectorstore(doc_chunks, embeddings)
+# Create the Chroma vectorstore, sharded when SHARD_BY is set to doc_type or hash
+if os.getenv('SHARD_BY'):
+    vector_DB = creat_sharded_vectorstore(doc_chunks, embeddings)
+    collection = next(iter(vector_DB.shards.values()))._collection
+else:
+    vector_DB = creat_vectorstore(doc_chunks, embeddings)
+    collection = vector_DB._collection
 # Finding the dimensions of the embeddings
-collection = vector_DB._collection
 sample_embedding = collection.get(limit=1, include=["embeddings"])["embeddings"][0]
 dimensions = len(sample_embedding)
 print(f"The vectors have {dimensions:,} dimensions")
\ No newline at end of file
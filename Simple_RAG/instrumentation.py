@@ -0,0 +1,281 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Counter, Histogram, start_http_server
+
+# Tag put on the question-rewrite runnables so their LLM calls are reported separately
+REWRITE_TAG = "question_rewrite"
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Wall time spent in each pipeline stage", ["app", "stage"])
+STAGE_TOKENS = Counter("rag_stage_tokens_total", "LLM tokens used in each pipeline stage", ["app", "stage", "kind"])
+CACHE_HITS = Counter("rag_cache_hits_total", "Cache hits in each pipeline stage", ["app", "stage"])
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens",
+    "Tokens of retrieved context packed into the prompt",
+    ["app"],
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000)
+)
+
+# Metrics of the request being served in the current thread or task
+active_metrics = ContextVar("active_metrics", default=None)
+
+_log_lock = threading.Lock()
+_server_lock = threading.Lock()
+_server_started = False
+
+logger = logging.getLogger(__name__)
+
+class RequestMetrics:
+    """Per-request wall time, token counts and cache hits, broken down by stage, and the packed context size."""
+
+    def __init__(self, app):
+        self.app = app
+        self.request_id = str(uuid.uuid4())
+        self.started = time.time()
+        self.total_seconds = None
+        self.stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+        self.tokens = defaultdict(lambda: {"input": 0, "output": 0})
+        self.cache_hits = defaultdict(int)
+        self.context_tokens = None
+        self._lock = threading.Lock()
+        self.callbacks = [StageTimingHandler(self)]
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.stages[stage]["seconds"] += seconds
+            self.stages[stage]["calls"] += 1
+
+    def add_tokens(self, stage, input_tokens, output_tokens):
+        with self._lock:
+            self.tokens[stage]["input"] += input_tokens
+            self.tokens[stage]["output"] += output_tokens
+
+    def add_cache_hit(self, stage):
+        with self._lock:
+            self.cache_hits[stage] += 1
+
+    def set_context_tokens(self, tokens):
+        self.context_tokens = tokens
+
+    def finish(self):
+        self.total_seconds = time.time() - self.started
+
+        # Retriever runs include embedding the query; report the search on its own
+        if "retrieval" in self.stages:
+            retrieval = self.stages.pop("retrieval")
+            embedding = self.stages.get("embed_query", {"seconds": 0.0})["seconds"]
+            self.stages["vector_search"] = {
+                "seconds": max(retrieval["seconds"] - embedding, 0.0),
+                "calls": retrieval["calls"]
+            }
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id,
+            "app": self.app,
+            "started": self.started,
+            "total_seconds": self.total_seconds,
+            "stages": dict(self.stages),
+            "tokens": dict(self.tokens),
+            "cache_hits": dict(self.cache_hits),
+            "context_tokens": self.context_tokens
+        }
+
+class StageTimingHandler(BaseCallbackHandler):
+    """Callback handler that times LLM, retriever and tool runs into a RequestMetrics."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._runs = {}
+        # Open retriever runs: parent run id, time spent in child retrievers, whether it has any
+        self._retrievers = {}
+
+    def _start(self, run_id, stage):
+        self._runs[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id):
+        if run_id not in self._runs:
+            return None
+        stage, start = self._runs.pop(run_id)
+        self.metrics.record(stage, time.perf_counter() - start)
+        return stage
+
+    def _llm_stage(self, tags):
+        return "question_rewrite" if tags and REWRITE_TAG in tags else "llm_generation"
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        self._start(run_id, self._llm_stage(tags))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        self._start(run_id, self._llm_stage(tags))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        stage = self._end(run_id)
+        if stage:
+            self.metrics.add_tokens(stage, *_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._retrievers[run_id] = {
+            "parent": parent_run_id,
+            "children_seconds": 0.0,
+            "wraps": False,
+            "start": time.perf_counter()
+        }
+        if parent_run_id in self._retrievers:
+            self._retrievers[parent_run_id]["wraps"] = True
+
+    def _end_retriever(self, run_id):
+        # Wrappers such as ContextualCompressionRetriever run their base retriever as a child
+        # run; only the innermost retriever is the search, the rest of a wrapper is packing
+        if run_id not in self._retrievers:
+            return
+        run = self._retrievers.pop(run_id)
+        seconds = time.perf_counter() - run["start"]
+        if run["wraps"]:
+            self.metrics.record("context_packing", max(seconds - run["children_seconds"], 0.0))
+        else:
+            self.metrics.record("retrieval", seconds)
+        if run["parent"] in self._retrievers:
+            self._retrievers[run["parent"]]["children_seconds"] += seconds
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end_retriever(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end_retriever(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, f"tool_{name}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+class TimedEmbeddings(Embeddings):
+    """Embeddings wrapper that times calls and caches recent query embeddings."""
+
+    def __init__(self, embeddings, cache_size=256):
+        self.embeddings = embeddings
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with record_stage("embed_documents"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        metrics = active_metrics.get()
+
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+
+        if vector is not None:
+            if metrics:
+                metrics.add_cache_hit("embed_query")
+            return vector
+
+        with record_stage("embed_query"):
+            vector = self.embeddings.embed_query(text)
+
+        with self._lock:
+            self._cache[text] = vector
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return vector
+
+@contextmanager
+def record_stage(stage):
+    """Time a block of code as a stage of the active request, if there is one."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = active_metrics.get()
+        if metrics:
+            metrics.record(stage, time.perf_counter() - start)
+
+@contextmanager
+def track_request(app):
+    """
+    Collect metrics for one request and export them when it completes
+    Args:
+        app (str): Application label used in the exported metrics
+    Yields:
+        RequestMetrics: Pass metrics.callbacks to the chain invocation
+    """
+    metrics = RequestMetrics(app)
+    token = active_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        active_metrics.reset(token)
+        metrics.finish()
+        export_metrics(metrics)
+
+def export_metrics(metrics):
+    """Publish request metrics to Prometheus and append them to the JSON lines log."""
+    for stage, values in metrics.stages.items():
+        STAGE_SECONDS.labels(metrics.app, stage).observe(values["seconds"])
+    STAGE_SECONDS.labels(metrics.app, "total").observe(metrics.total_seconds)
+    for stage, counts in metrics.tokens.items():
+        for kind, count in counts.items():
+            STAGE_TOKENS.labels(metrics.app, stage, kind).inc(count)
+    for stage, hits in metrics.cache_hits.items():
+        CACHE_HITS.labels(metrics.app, stage).inc(hits)
+    if metrics.context_tokens is not None:
+        CONTEXT_TOKENS.labels(metrics.app).observe(metrics.context_tokens)
+
+    with _log_lock:
+        with open(os.getenv("METRICS_LOG", "request_metrics.jsonl"), "a") as f:
+            f.write(json.dumps(metrics.to_dict()) + "\n")
+
+def start_metrics_server(default_port=9464):
+    """
+    Expose the Prometheus metrics endpoint once per process
+    Args:
+        default_port (int): Port used when METRICS_PORT is unset; each app has its own
+    """
+    global _server_started
+    with _server_lock:
+        if _server_started:
+            return
+        # Only tried once: metrics must never break the request that happens to start them
+        _server_started = True
+        port = int(os.getenv("METRICS_PORT", default_port))
+        try:
+            start_http_server(port)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+
+def _token_usage(response):
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+
+    # Older integrations only report usage in llm_output
+    if not (input_tokens or output_tokens) and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
@@ -0,0 +1,101 @@
+"""
+Load test the Gradio chat handler with increasing numbers of concurrent users.
+
+Each simulated user has its own session and sends a short conversation, one turn after
+another, through the same async chat handler Gradio calls. A semaphore sized like the
+Gradio concurrency limit stands in for the queue. By default the LLM and embeddings are
+the offline stand-ins from models.py, so no API calls are made:
+
+    python load_test.py --users 1 2 4 8 16 32 --turns 3
+
+Pass --live to use the providers configured in the environment instead.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from types import SimpleNamespace
+from unittest import mock
+from dotenv import load_dotenv
+
+QUESTIONS = [
+    "Who received the prestigious IIOTY award in 2023?",
+    "What products does the company offer to insurers?",
+    "Which employees work on the Carllm product?",
+    "What does the contract with the largest client cover?",
+    "Tell me more about them.",
+    "What is her role?"
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+async def run_level(chat, users, turns, concurrency):
+    """
+    Run one load level
+    Args:
+        chat: The app's async chat handler
+        users (int): Concurrent users, each with its own session
+        turns (int): Messages each user sends
+        concurrency (int): Requests served at once, like Gradio's concurrency limit
+    Returns:
+        dict: Throughput and latency statistics
+    """
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+    level_id = random.getrandbits(32)
+
+    async def user(i):
+        request = SimpleNamespace(session_hash=f"load-{level_id}-{i}")
+        history = []
+        for _ in range(turns):
+            message = random.choice(QUESTIONS)
+            start = time.perf_counter()
+            # Waiting for a slot counts towards latency, as it would in the Gradio queue
+            async with limit:
+                answer = await chat(message, history, request)
+            latencies.append(time.perf_counter() - start)
+            history += [{"role": "user", "content": message}, {"role": "assistant", "content": answer}]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('GRADIO_CONCURRENCY', 16)))
+    parser.add_argument("--live", action="store_true", help="use the configured providers instead of the offline stand-ins")
+    args = parser.parse_args()
+
+    # Apply .env the way app.py does, then pin the offline backends on top of it
+    load_dotenv(override=True)
+    if not args.live:
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["EMBEDDING_BACKEND"] = "hashing"
+
+    # app reads the backend settings when it is imported; its own load_dotenv(override=True)
+    # would put .env's backends back, so it is skipped here
+    with mock.patch("dotenv.load_dotenv"):
+        from app import chat
+
+    print(f"{'users':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for users in args.users:
+        result = asyncio.run(run_level(chat, users, args.turns, args.concurrency))
+        print(
+            f"{users:>6} {result['requests']:>9} {result['throughput']:>8.2f} "
+            f"{result['p50'] * 1000:>8.0f} {result['p95'] * 1000:>8.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
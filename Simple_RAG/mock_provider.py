@@ -0,0 +1,236 @@
+"""
+Local OpenAI-compatible mock provider for exercising the client pool.
+
+Serves /v1/embeddings and /v1/chat/completions with deterministic responses and its own
+requests-per-second limit, answering 429 with Retry-After once it is exceeded, the way
+the real API does. GET /stats reports what it saw:
+
+    python mock_provider.py serve --port 8089 --rps 5
+
+The check command starts the server in-process, points the app's models at it and
+fires concurrent embedding and chat calls through the shared pool, then reports how
+many requests reached the server, how many were throttled, the mean embedding batch
+and the queueing delay the pool measured:
+
+    python mock_provider.py check --callers 64 --rps 5
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockState:
+    """Rate limit and counters shared by the server's handler threads."""
+
+    def __init__(self, rps, dimensions, latency):
+        self.rps = rps
+        self.dimensions = dimensions
+        self.latency = latency
+        self.allowance = rps
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "embedding_requests": 0, "embedded_inputs": 0, "chat_requests": 0}
+
+    def admit(self):
+        """Count a request; returns seconds until the next slot if it is over the limit, else 0."""
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rps, self.allowance + (now - self.updated) * self.rps)
+            self.updated = now
+            self.stats["requests"] += 1
+            if self.allowance < 1:
+                self.stats["throttled"] += 1
+                return (1 - self.allowance) / self.rps
+            self.allowance -= 1
+            return 0
+
+    def count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+def mock_embedding(item, dimensions):
+    # Inputs arrive as strings or, from tiktoken-aware clients, as token id lists
+    seed = hashlib.md5(json.dumps(item).encode()).digest()
+    values = []
+    while len(values) < dimensions:
+        seed = hashlib.md5(seed).digest()
+        values.extend((byte - 127.5) / 127.5 for byte in seed)
+    return values[:dimensions]
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.state.lock:
+                self._send(200, dict(self.state.stats))
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        wait = self.state.admit()
+        if wait:
+            self._send(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": f"{wait:.3f}"}
+            )
+            return
+
+        time.sleep(self.state.latency)
+        if self.path.endswith("/embeddings"):
+            self._embeddings(body)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(body)
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def _embeddings(self, body):
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        self.state.count(embedding_requests=1, embedded_inputs=len(inputs))
+
+        data = []
+        for i, item in enumerate(inputs):
+            vector = mock_embedding(item, self.state.dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(item) if isinstance(item, list) else len(item.split()) for item in inputs)
+        self._send(200, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "mock-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    def _chat(self, body):
+        self.state.count(chat_requests=1)
+        messages = body.get("messages", [])
+        content = str(messages[-1].get("content", "")) if messages else ""
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        completion_tokens = len(content.split())
+        self._send(200, {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Echo: {content}"},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+def start_server(port=0, rps=5.0, dimensions=1536, latency=0.05):
+    """
+    Run the mock provider on a background thread
+    Returns:
+        ThreadingHTTPServer: Call shutdown() to stop it; server_port holds the bound port
+    """
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(rps, dimensions, latency)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.state = handler.state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def check(callers, rps, chats, latency, client_rps=None):
+    """Drive the app's models through the pool against an in-process mock and print a summary."""
+    server = start_server(rps=rps, latency=latency)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.update({
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_BASE": base_url,
+        "OPENAI_API_KEY": "mock-key",
+        "OPENAI_REQUESTS_PER_SECOND": str(client_rps or rps),
+        "MODEL": os.getenv("MODEL", "gpt-4o-mini"),
+        "LLM_BACKEND": "openai",
+        "EMBEDDING_BACKEND": "openai"
+    })
+
+    # models reads the settings above when the factories run
+    from prometheus_client import REGISTRY
+    from models import get_chat_model, get_embeddings
+
+    embeddings = get_embeddings()
+    llm = get_chat_model()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        start = time.perf_counter()
+        query_futures = [pool.submit(embeddings.embed_query, f"question {i}") for i in range(callers)]
+        chat_futures = [pool.submit(llm.invoke, f"hello {i}") for i in range(chats)]
+        for future in query_futures + chat_futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    stats = server.state.stats
+    print(f"{callers} embed_query calls and {chats} chat calls in {elapsed:.2f}s")
+    print(f"server saw {stats['requests']} requests, {stats['throttled']} answered 429")
+    if stats["embedding_requests"]:
+        print(f"embedding requests: {stats['embedding_requests']}, mean batch {stats['embedded_inputs'] / stats['embedding_requests']:.1f}")
+    for reason in ("rate_limit", "batching"):
+        labels = {"provider": "openai", "reason": reason}
+        total = REGISTRY.get_sample_value("rag_provider_queue_seconds_sum", labels) or 0.0
+        count = REGISTRY.get_sample_value("rag_provider_queue_seconds_count", labels) or 0.0
+        if count:
+            print(f"{reason} queueing: {total:.2f}s over {count:.0f} waits, mean {total / count * 1000:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the mock provider")
+    serve_parser.add_argument("--port", type=int, default=8089)
+    serve_parser.add_argument("--rps", type=float, default=5.0)
+    serve_parser.add_argument("--dimensions", type=int, default=1536)
+    serve_parser.add_argument("--latency", type=float, default=0.05)
+
+    check_parser = commands.add_parser("check", help="drive the client pool against an in-process mock")
+    check_parser.add_argument("--callers", type=int, default=64)
+    check_parser.add_argument("--chats", type=int, default=8)
+    check_parser.add_argument("--rps", type=float, default=5.0)
+    check_parser.add_argument("--client-rps", type=float, help="pool's own limit, above --rps to provoke 429s")
+    check_parser.add_argument("--latency", type=float, default=0.05)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        server = start_server(args.port, args.rps, args.dimensions, args.latency)
+        print(f"Mock provider on http://127.0.0.1:{server.server_port}/v1 ({args.rps} requests/s)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        check(args.callers, args.rps, args.chats, args.latency, args.client_rps)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+import time
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from client_pool import CoalescingEmbeddings, get_async_http_client, get_coalescing_embeddings, get_http_client
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load testing. Each call waits for a time to first token
+    drawn from a log-normal distribution plus the time to stream its output tokens,
+    then echoes the last message.
+    """
+    latency_median: float = 0.5
+    latency_sigma: float = 0.4
+    tokens_per_second: float = 60.0
+    output_tokens: int = 150
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        words = str(messages[-1].content).split()
+        words += ["lorem"] * max(self.output_tokens - len(words), 0)
+        text = " ".join(words[:self.output_tokens])
+        delay = random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+        delay += self.output_tokens / self.tokens_per_second
+
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": prompt_tokens + self.output_tokens
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)]), delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, delay = self._reply(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, delay = self._reply(messages)
+        await asyncio.sleep(delay)
+        return result
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic offline embeddings: words are hashed into a fixed number of signed
+    buckets and the counts L2-normalised, so texts sharing words end up close together.
+    """
+
+    def __init__(self, dimensions=384, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(hashlib.md5(word.encode()).digest()[:8], "little")
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dimensions] += sign
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._embed(text)
+
+def get_chat_model():
+    """Create the chat model selected by LLM_BACKEND ("openai" or "fake")."""
+    if os.getenv("LLM_BACKEND", "openai") == "fake":
+        return FakeChatModel(
+            latency_median=float(os.getenv("FAKE_LLM_LATENCY_MEDIAN", 0.5)),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.4)),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 60)),
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", 150))
+        )
+
+    # Pooled, rate-limited connections; retries happen in the pool, not the SDK
+    return ChatOpenAI(
+        temperature=0.7,
+        model_name=os.environ['MODEL'],
+        api_key=os.environ['OPENAI_API_KEY'],
+        http_client=get_http_client("openai"),
+        http_async_client=get_async_http_client("openai"),
+        max_retries=0
+    )
+
+def get_embeddings():
+    """Create the embedding model selected by EMBEDDING_BACKEND ("openai" or "hashing")."""
+    if os.getenv("EMBEDDING_BACKEND", "openai") == "hashing":
+        # Same dimensionality as text-embedding-ada-002, so the shipped vector_db can be queried
+        return HashingEmbeddings(
+            dimensions=1536,
+            latency=float(os.getenv("FAKE_EMBEDDING_LATENCY", 0.0))
+        )
+
+    def build():
+        embeddings = OpenAIEmbeddings(
+            http_client=get_http_client("openai"),
+            http_async_client=get_async_http_client("openai"),
+            max_retries=0
+        )
+        return CoalescingEmbeddings(embeddings, "openai")
+
+    # Concurrent sessions' query embeddings go out as one request, through one batcher per process
+    return get_coalescing_embeddings("openai", build)
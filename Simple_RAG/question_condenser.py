@@ -0,0 +1,72 @@
+import re
+from langchain.chains.base import Chain
+from instrumentation import REWRITE_TAG
+
+# Words and phrases that usually point back at an earlier turn
+FOLLOW_UP_WORDS = {
+    "it", "its", "they", "them", "their", "theirs", "he", "she", "him", "her",
+    "his", "this", "that", "these", "those", "former", "latter", "same",
+    "also", "else", "again", "above", "previous", "earlier", "mentioned"
+}
+FOLLOW_UP_PHRASES = ("what about", "how about", "tell me more", "you said", "the first", "the second", "the last")
+
+def is_self_contained(question):
+    """Cheap local check for whether a question can be retrieved on without the chat history."""
+    text = question.lower()
+    words = re.findall(r"[a-z0-9']+", text)
+
+    # Very short questions are almost always follow-ups ("why?", "and her role?")
+    if len(words) < 4:
+        return False
+
+    if any(phrase in text for phrase in FOLLOW_UP_PHRASES):
+        return False
+
+    return not any(word in FOLLOW_UP_WORDS for word in words)
+
+class SelfContainedQuestionGenerator(Chain):
+    """
+    Drop-in question generator for ConversationalRetrievalChain that skips the
+    condense-question LLM call when the question does not depend on the chat history.
+    """
+    question_generator: Chain
+
+    @property
+    def input_keys(self):
+        return ["question", "chat_history"]
+
+    @property
+    def output_keys(self):
+        return ["text"]
+
+    def _call(self, inputs, run_manager=None):
+        if is_self_contained(inputs["question"]):
+            return {"text": inputs["question"]}
+        callbacks = run_manager.get_child() if run_manager else None
+        return {"text": self.question_generator.run(
+            question=inputs["question"],
+            chat_history=inputs["chat_history"],
+            callbacks=callbacks,
+            # Inheritable, so the inner LLM call is reported as the rewrite
+            tags=[REWRITE_TAG]
+        )}
+
+    async def _acall(self, inputs, run_manager=None):
+        if is_self_contained(inputs["question"]):
+            return {"text": inputs["question"]}
+        callbacks = run_manager.get_child() if run_manager else None
+        return {"text": await self.question_generator.arun(
+            question=inputs["question"],
+            chat_history=inputs["chat_history"],
+            callbacks=callbacks,
+            # Inheritable, so the inner LLM call is reported as the rewrite
+            tags=[REWRITE_TAG]
+        )}
+
+def skip_self_contained_rewrites(conversation_chain):
+    """Install the fast path on an existing ConversationalRetrievalChain."""
+    conversation_chain.question_generator = SelfContainedQuestionGenerator(
+        question_generator=conversation_chain.question_generator,
+        tags=[REWRITE_TAG]
+    )
+    return conversation_chain
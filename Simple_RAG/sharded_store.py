@@ -0,0 +1,168 @@
+import heapq
+import os
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.vectorstores import VectorStore
+
+class ShardedVectorStore(VectorStore):
+    """
+    Vector store split across several Chroma collections.
+
+    Records are partitioned either by their doc_type metadata (one shard per type) or by
+    a hash of their id (a fixed number of shards). Queries embed once, search every shard
+    concurrently from a thread pool and merge the per-shard top-k with a heap.
+    """
+
+    def __init__(self, embedding, persist_directory=None, partition="doc_type", num_shards=4,
+                 collection_prefix="shard", max_workers=None, client=None):
+        if partition not in ("doc_type", "hash"):
+            raise ValueError(f"Unknown partition scheme: {partition}")
+
+        self._embedding = embedding
+        self.partition = partition
+        self.num_shards = num_shards
+        self.collection_prefix = collection_prefix
+        if client is None:
+            client = chromadb.PersistentClient(path=persist_directory) if persist_directory else chromadb.EphemeralClient()
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) * 4))
+        self.shards = {}
+
+        # Reopen shards that already exist in the database
+        for collection in self.client.list_collections():
+            name = getattr(collection, "name", collection)
+            if name.startswith(f"{collection_prefix}_"):
+                self._shard(name[len(collection_prefix) + 1:])
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _shard(self, key):
+        if key not in self.shards:
+            self.shards[key] = Chroma(
+                client=self.client,
+                collection_name=f"{self.collection_prefix}_{key}",
+                embedding_function=self._embedding
+            )
+        return self.shards[key]
+
+    def _shard_key(self, record_id, metadata, num_shards=None):
+        if self.partition == "doc_type":
+            return str(metadata.get("doc_type", "default"))
+        return str(zlib.crc32(record_id.encode("utf-8")) % (num_shards or self.num_shards))
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Route each text to its shard and add it there."""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        groups = {}
+        for text, metadata, record_id in zip(texts, metadatas, ids):
+            group = groups.setdefault(self._shard_key(record_id, metadata), ([], [], []))
+            group[0].append(text)
+            group[1].append(metadata)
+            group[2].append(record_id)
+
+        futures = [
+            self.executor.submit(self._shard(key).add_texts, group_texts, metadatas=group_metadatas, ids=group_ids)
+            for key, (group_texts, group_metadatas, group_ids) in groups.items()
+        ]
+        for future in futures:
+            future.result()
+        return ids
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        """
+        Search all shards concurrently and merge their results
+        Args:
+            query (str): Search query
+            k (int): Number of results
+            filter (dict, optional): Chroma metadata filter; a doc_type filter is answered
+                by its shard alone when partitioning by doc_type
+        Returns:
+            List of (Document, distance) pairs, closest first
+        """
+        query_embedding = self._embedding.embed_query(query)
+
+        shards = list(self.shards.values())
+        if self.partition == "doc_type" and filter and isinstance(filter.get("doc_type"), str):
+            shards = [self.shards[filter["doc_type"]]] if filter["doc_type"] in self.shards else []
+
+        futures = [
+            self.executor.submit(shard.similarity_search_by_vector_with_relevance_scores, query_embedding, k=k, filter=filter)
+            for shard in shards
+        ]
+        results = (pair for future in futures for pair in future.result())
+        return heapq.nsmallest(k, results, key=lambda pair: pair[1])
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def rebalance(self, num_shards, batch_size=1000):
+        """
+        Move records between hash shards after changing the shard count
+        Args:
+            num_shards (int): New number of shards
+            batch_size (int): Records read from a shard at a time
+        Returns:
+            int: Number of records moved
+        """
+        if self.partition != "hash":
+            raise ValueError("Only hash-partitioned stores can be rebalanced")
+
+        moved = 0
+        for key in list(self.shards):
+            source = self.shards[key]._collection
+            offset = 0
+            while True:
+                batch = source.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+                if not batch["ids"]:
+                    break
+
+                stay = 0
+                targets = {}
+                for i, record_id in enumerate(batch["ids"]):
+                    target = self._shard_key(record_id, batch["metadatas"][i], num_shards)
+                    if target == key:
+                        stay += 1
+                    else:
+                        targets.setdefault(target, []).append(i)
+
+                for target, rows in targets.items():
+                    self._shard(target)._collection.upsert(
+                        ids=[batch["ids"][i] for i in rows],
+                        embeddings=[batch["embeddings"][i] for i in rows],
+                        documents=[batch["documents"][i] for i in rows],
+                        metadatas=[batch["metadatas"][i] for i in rows]
+                    )
+                    source.delete(ids=[batch["ids"][i] for i in rows])
+                    moved += len(rows)
+
+                # Moved records are gone from the source, so only skip the ones that stayed
+                offset += stay
+
+        # Drop shards that no longer exist under the new count
+        for key in list(self.shards):
+            if int(key) >= num_shards:
+                self.client.delete_collection(f"{self.collection_prefix}_{key}")
+                del self.shards[key]
+
+        self.num_shards = num_shards
+        return moved
+
+    def delete_all(self):
+        """Drop every shard collection."""
+        for key in list(self.shards):
+            self.client.delete_collection(f"{self.collection_prefix}_{key}")
+            del self.shards[key]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
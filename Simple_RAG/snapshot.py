@@ -0,0 +1,362 @@
+"""
+Compact, memory-mappable snapshots of a Chroma collection for deployment.
+
+A snapshot is a directory holding:
+    manifest.json       count, dimensions, distance and metadata keys
+    vectors.f32         row-major float32 embedding matrix (count x dimensions)
+    norms.f32           squared L2 norm of every row
+    ids.bin/.offsets    UTF-8 ids, concatenated, with int64 start offsets
+    documents.bin/.offsets
+    metadata.bin/.offsets
+                        one JSON object per row, laid out the same way
+    ivf_centroids.f32   k-means centroids of the rows (lists x dimensions)
+    ivf_rows.i64/.offsets
+                        row numbers grouped by nearest centroid, with int64 list offsets
+
+Loading only maps the files; nothing is read until a query touches it, so a replica
+can start serving in milliseconds regardless of corpus size, and a query only decodes
+the rows it returns.
+
+Collections of at least IVF_MIN_ROWS rows get the inverted-file index: a query compares
+itself with the centroids and scans only the rows of its nprobe nearest lists, about
+nprobe / lists of the vectors, instead of all of them. Raising nprobe (SNAPSHOT_NPROBE)
+trades latency for recall. Smaller collections are searched exactly, which reads every
+vector per query; at 1536 dimensions that is 6 KB a row, fine up to a few tens of
+thousands of rows.
+
+The snapshot path is a symlink to a versioned directory next to it. An export writes a
+new version and swaps the link in one rename, so readers see either the old snapshot or
+the new one, never neither. The previous version is kept for readers still opening it.
+
+    python snapshot.py export --db vector_db --out vector_snapshot
+    python snapshot.py export --db ../RAG_Research_Assistant/Agentic_RAG/paper_db --collection research_papers --out paper_snapshot
+    python snapshot.py info vector_snapshot
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from typing import Any, List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+FORMAT_VERSION = 2
+SEARCH_BLOCK_ROWS = 65536
+IVF_MIN_ROWS = 50000
+IVF_TRAIN_ROWS_PER_LIST = 32
+
+def _prepare(vectors, space):
+    # Cosine distance ranks like L2 distance between unit vectors
+    if space == "cosine":
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors
+
+def _nearest_centroids(vectors, centroids):
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    return np.argmin(centroid_norms - 2.0 * (vectors @ centroids.T), axis=1)
+
+def build_ivf(vectors, space, n_lists=None, iterations=10, seed=0):
+    """
+    Cluster the rows with k-means and group them by nearest centroid
+    Args:
+        vectors (numpy.ndarray): Row vectors, typically the memory-mapped vectors.f32
+        space (str): Collection distance, "l2", "ip" or "cosine"
+        n_lists (int, optional): Number of lists, defaults to the square root of the row count
+        iterations (int): Lloyd iterations over the training sample
+    Returns:
+        tuple: (centroids, rows grouped by list, list start offsets)
+    """
+    count = len(vectors)
+    n_lists = n_lists or max(int(np.sqrt(count)), 1)
+    rng = np.random.default_rng(seed)
+
+    # Trained on a sample, then every row is assigned in blocks
+    sample_rows = np.sort(rng.choice(count, min(count, n_lists * IVF_TRAIN_ROWS_PER_LIST), replace=False))
+    sample = _prepare(np.asarray(vectors[sample_rows], dtype=np.float32), space)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        sizes = np.bincount(assignment, minlength=n_lists)
+        # Empty lists keep their old centroid
+        filled = sizes > 0
+        centroids[filled] = sums[filled] / sizes[filled, None]
+
+    assignment = np.concatenate([
+        _nearest_centroids(_prepare(np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS]), space), centroids)
+        for start in range(0, count, SEARCH_BLOCK_ROWS)
+    ])
+    rows = np.argsort(assignment, kind="stable").astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+    return centroids.astype(np.float32), rows, offsets
+
+def export_snapshot(db_path, out_dir, collection_name="langchain", batch_size=5000, ivf_min_rows=IVF_MIN_ROWS):
+    """
+    Write a Chroma collection to a snapshot directory
+    Args:
+        db_path (str): Chroma persist directory
+        out_dir (str): Snapshot path to create or replace, a symlink to the current version
+        collection_name (str): Collection to export ("langchain" for langchain_chroma stores)
+        batch_size (int): Records read from Chroma at a time
+        ivf_min_rows (int): Collections this large get an inverted-file index
+    Returns:
+        dict: The snapshot manifest
+    """
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=db_path).get_collection(collection_name)
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    count = collection.count()
+
+    # Build a new version next to the target; it is only linked in once complete
+    out_dir = out_dir.rstrip("/")
+    version_dir = f"{out_dir}.{time.time_ns()}"
+    os.makedirs(version_dir)
+    try:
+        manifest = _write_snapshot(collection, version_dir, count, space, collection_name, batch_size, ivf_min_rows)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    previous = os.readlink(out_dir) if os.path.islink(out_dir) else None
+    if os.path.isdir(out_dir) and previous is None:
+        # A snapshot from before versioning is a plain directory, which a link cannot replace
+        shutil.rmtree(out_dir)
+
+    link_tmp = f"{out_dir}.link.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(version_dir), link_tmp)
+    os.replace(link_tmp, out_dir)
+
+    # Keep the new version and the one just replaced, drop anything older
+    keep = {os.path.basename(version_dir), previous and os.path.basename(previous)}
+    parent = os.path.dirname(out_dir) or "."
+    pattern = re.compile(re.escape(os.path.basename(out_dir)) + r"\.\d+")
+    for name in os.listdir(parent):
+        if pattern.fullmatch(name) and name not in keep:
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+    return manifest
+
+def _write_snapshot(collection, snapshot_dir, count, space, collection_name, batch_size, ivf_min_rows):
+    dimensions = None
+    rows = 0
+    metadata_keys = set()
+    id_offsets, document_offsets, metadata_offsets = [0], [0], [0]
+
+    with open(os.path.join(snapshot_dir, "vectors.f32"), "wb") as vectors_file, \
+         open(os.path.join(snapshot_dir, "norms.f32"), "wb") as norms_file, \
+         open(os.path.join(snapshot_dir, "ids.bin"), "wb") as ids_file, \
+         open(os.path.join(snapshot_dir, "documents.bin"), "wb") as documents_file, \
+         open(os.path.join(snapshot_dir, "metadata.bin"), "wb") as metadata_file:
+        for offset in range(0, count, batch_size):
+            batch = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+            dimensions = vectors.shape[1]
+            vectors_file.write(vectors.tobytes())
+            norms_file.write(np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tobytes())
+
+            for record_id, document, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                encoded_id = record_id.encode("utf-8")
+                encoded_document = (document or "").encode("utf-8")
+                encoded_metadata = json.dumps(metadata or {}).encode("utf-8")
+                ids_file.write(encoded_id)
+                documents_file.write(encoded_document)
+                metadata_file.write(encoded_metadata)
+                id_offsets.append(id_offsets[-1] + len(encoded_id))
+                document_offsets.append(document_offsets[-1] + len(encoded_document))
+                metadata_offsets.append(metadata_offsets[-1] + len(encoded_metadata))
+                metadata_keys.update(metadata or {})
+                rows += 1
+
+    np.asarray(id_offsets, dtype=np.int64).tofile(os.path.join(snapshot_dir, "ids.offsets"))
+    np.asarray(document_offsets, dtype=np.int64).tofile(os.path.join(snapshot_dir, "documents.offsets"))
+    np.asarray(metadata_offsets, dtype=np.int64).tofile(os.path.join(snapshot_dir, "metadata.offsets"))
+
+    ivf_lists = 0
+    if rows >= ivf_min_rows:
+        vectors = np.memmap(os.path.join(snapshot_dir, "vectors.f32"), dtype=np.float32, mode="r", shape=(rows, dimensions))
+        centroids, list_rows, list_offsets = build_ivf(vectors, space)
+        centroids.tofile(os.path.join(snapshot_dir, "ivf_centroids.f32"))
+        list_rows.tofile(os.path.join(snapshot_dir, "ivf_rows.i64"))
+        list_offsets.tofile(os.path.join(snapshot_dir, "ivf_rows.offsets"))
+        ivf_lists = len(centroids)
+        del vectors
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "collection": collection_name,
+        "count": rows,
+        "dimensions": dimensions or 0,
+        "space": space,
+        "metadata_keys": sorted(metadata_keys),
+        "ivf_lists": ivf_lists
+    }
+    with open(os.path.join(snapshot_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+class SnapshotStore:
+    """
+    Read-only vector store served straight from a memory-mapped snapshot
+    Args:
+        path (str): Snapshot path
+        nprobe (int, optional): Lists scanned per query on indexed snapshots, defaults to
+            SNAPSHOT_NPROBE or a sixteenth of the lists
+    """
+
+    def __init__(self, path, nprobe=None):
+        # Resolve the link once, so every file comes from the same version even if an export swaps it
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest['format']}")
+
+        self.path = path
+        self.count = self.manifest["count"]
+        self.dimensions = self.manifest["dimensions"]
+        self.space = self.manifest["space"]
+        self.vectors = self._map("vectors.f32", np.float32, (self.count, self.dimensions))
+        self.norms = self._map("norms.f32", np.float32, (self.count,))
+        self.id_offsets = self._map("ids.offsets", np.int64, (self.count + 1,))
+        self.document_offsets = self._map("documents.offsets", np.int64, (self.count + 1,))
+        self.ids_blob = self._map("ids.bin", np.uint8, None)
+        self.documents_blob = self._map("documents.bin", np.uint8, None)
+        self.metadata_offsets = self._map("metadata.offsets", np.int64, (self.count + 1,))
+        self.metadata_blob = self._map("metadata.bin", np.uint8, None)
+
+        self.ivf_lists = self.manifest.get("ivf_lists", 0)
+        if self.ivf_lists:
+            self.centroids = self._map("ivf_centroids.f32", np.float32, (self.ivf_lists, self.dimensions))
+            self.centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+            self.list_rows = self._map("ivf_rows.i64", np.int64, (self.count,))
+            self.list_offsets = self._map("ivf_rows.offsets", np.int64, (self.ivf_lists + 1,))
+        self.nprobe = nprobe or int(os.getenv("SNAPSHOT_NPROBE", 0)) or max(self.ivf_lists // 16, 1)
+
+    def _map(self, name, dtype, shape):
+        file_path = os.path.join(self.path, name)
+        if os.path.getsize(file_path) == 0:
+            return np.zeros(shape or (0,), dtype=dtype)
+        return np.memmap(file_path, dtype=dtype, mode="r", shape=shape)
+
+    def _text(self, blob, offsets, row):
+        return bytes(blob[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def _metadata(self, row):
+        return json.loads(self._text(self.metadata_blob, self.metadata_offsets, row))
+
+    def _blocks(self, query):
+        """Yield (row numbers, vectors, norms) for the rows a query has to be compared with."""
+        if not self.ivf_lists:
+            for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self.count)
+                yield np.arange(start, end), self.vectors[start:end], self.norms[start:end]
+            return
+
+        probe = _prepare(query[None, :], self.space)[0]
+        centroid_distances = self.centroid_norms - 2.0 * (self.centroids @ probe)
+        nprobe = min(self.nprobe, self.ivf_lists)
+        lists = np.argpartition(centroid_distances, nprobe - 1)[:nprobe]
+        # Sorted rows make the gathers below read the mapped file front to back
+        rows = np.sort(np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists]))
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block_rows = rows[start:start + SEARCH_BLOCK_ROWS]
+            yield block_rows, self.vectors[block_rows], self.norms[block_rows]
+
+    def search(self, query_vector, k=4):
+        """
+        Nearest-neighbour search in blocks of rows, over the probed lists when the
+        snapshot is indexed and over every row otherwise
+        Args:
+            query_vector (list): Query embedding
+            k (int): Number of results
+        Returns:
+            List of (row, distance) pairs, closest first, using the collection's distance
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = float(query @ query)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0, dtype=np.float32)
+
+        for rows, block, norms in self._blocks(query):
+            dots = block @ query
+            if self.space == "ip":
+                distances = 1.0 - dots
+            elif self.space == "cosine":
+                distances = 1.0 - dots / np.sqrt(norms * query_norm + 1e-12)
+            else:
+                distances = norms + query_norm - 2.0 * dots
+
+            # Keep only this block's top k before merging with the running best
+            top = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+            best_rows = np.concatenate([best_rows, rows[top]])
+            best_distances = np.concatenate([best_distances, distances[top]])
+            if len(best_rows) > k:
+                keep = np.argpartition(best_distances, k - 1)[:k]
+                best_rows, best_distances = best_rows[keep], best_distances[keep]
+
+        order = np.argsort(best_distances)
+        return [(int(best_rows[i]), float(best_distances[i])) for i in order]
+
+    def get_document(self, row):
+        metadata = self._metadata(row)
+        metadata.setdefault("id", self._text(self.ids_blob, self.id_offsets, row))
+        return Document(
+            page_content=self._text(self.documents_blob, self.document_offsets, row),
+            metadata=metadata
+        )
+
+    def similarity_search_with_score(self, query_vector, k=4):
+        return [(self.get_document(row), distance) for row, distance in self.search(query_vector, k)]
+
+class SnapshotRetriever(BaseRetriever):
+    """Retriever over a SnapshotStore, a drop-in for the Chroma retriever."""
+    store: Any
+    embeddings: Embeddings
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        query_vector = self.embeddings.embed_query(query)
+        return [doc for doc, _ in self.store.similarity_search_with_score(query_vector, self.k)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write a Chroma collection to a snapshot")
+    export_parser.add_argument("--db", required=True, help="Chroma persist directory")
+    export_parser.add_argument("--out", required=True, help="snapshot directory")
+    export_parser.add_argument("--collection", default="langchain")
+    export_parser.add_argument("--ivf-min-rows", type=int, default=IVF_MIN_ROWS, help="index collections at least this large")
+
+    info_parser = commands.add_parser("info", help="open a snapshot and report its load time")
+    info_parser.add_argument("snapshot")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        manifest = export_snapshot(args.db, args.out, args.collection, ivf_min_rows=args.ivf_min_rows)
+        print(f"Exported {manifest['count']:,} vectors of {manifest['dimensions']} dimensions to {args.out}")
+        if manifest["ivf_lists"]:
+            print(f"Indexed into {manifest['ivf_lists']:,} lists")
+    else:
+        start = time.perf_counter()
+        store = SnapshotStore(args.snapshot)
+        elapsed = time.perf_counter() - start
+        print(f"Opened {store.count:,} vectors of {store.dimensions} dimensions in {elapsed * 1000:.1f} ms")
+        if store.ivf_lists:
+            print(f"Indexed: {store.ivf_lists:,} lists, {store.nprobe} probed per query")
+        else:
+            print("Not indexed: every query scans all vectors")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Project a Chroma collection to 2D or 3D and plot it, at any corpus size.
+
+Vectors are streamed from Chroma in batches, twice: the first pass fits an incremental
+PCA, the second reduces every vector with it. t-SNE or UMAP, when asked for, then runs
+on a random sample of the PCA output. Projections are cached on disk, keyed by the
+collection and the time its database was last written, so replotting is instant until
+the data changes. Only ids and doc_type codes are kept per row; hover previews are fetched
+for the points actually drawn. Plots use WebGL and are downsampled to a fixed number of points:
+
+    python visualize.py --db vector_db --method pca --out vectors.html
+    python visualize.py --db vector_db --method tsne --dimensions 3 --sample 20000
+"""
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+
+PREVIEW_CHARS = 80
+# Bumped when the cached arrays change shape
+CACHE_FORMAT = 2
+
+def iter_batches(collection, batch_size=5000, include=("embeddings",)):
+    """Yield collection.get results batch_size records at a time."""
+    for offset in range(0, collection.count(), batch_size):
+        yield collection.get(limit=batch_size, offset=offset, include=list(include))
+
+def collection_version(db_path, collection):
+    """Changes whenever the collection is written: its id, size and the database's mtime."""
+    sqlite_path = os.path.join(db_path, "chroma.sqlite3")
+    modified = os.path.getmtime(sqlite_path) if os.path.exists(sqlite_path) else 0
+    return f"{collection.id}:{collection.count()}:{modified}"
+
+def open_collection(db_path, collection_name="langchain"):
+    import chromadb
+
+    return chromadb.PersistentClient(path=db_path).get_collection(collection_name)
+
+def fetch_previews(collection, ids, batch_size=5000):
+    """First PREVIEW_CHARS characters of the documents with the given ids, in the same order."""
+    previews = []
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        batch = collection.get(ids=batch_ids, include=["documents"])
+        # get() does not promise to keep the order of ids
+        documents = dict(zip(batch["ids"], batch["documents"]))
+        previews.extend((documents.get(i) or "")[:PREVIEW_CHARS] for i in batch_ids)
+    return previews
+
+def fit_incremental_pca(collection, n_components, batch_size):
+    from sklearn.decomposition import IncrementalPCA
+
+    pca = IncrementalPCA(n_components=n_components)
+    pending = []
+    pending_rows = 0
+    for batch in iter_batches(collection, batch_size):
+        pending.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        pending_rows += len(pending[-1])
+        # partial_fit needs at least n_components rows per call
+        if pending_rows >= n_components:
+            pca.partial_fit(np.concatenate(pending))
+            pending, pending_rows = [], 0
+    # A tail too short for partial_fit is left out of the fit; it is still transformed
+    if pending_rows >= n_components:
+        pca.partial_fit(np.concatenate(pending))
+    return pca
+
+def project(db_path, collection_name="langchain", method="pca", dimensions=2, batch_size=5000,
+            pca_components=50, sample_size=20000, cache_dir=".projection_cache", seed=42):
+    """
+    Reduce every vector in a collection to 2 or 3 dimensions
+    Args:
+        db_path (str): Chroma persist directory
+        collection_name (str): Collection to project ("langchain" for langchain_chroma stores)
+        method (str): "pca", or "tsne"/"umap" run on a sample of the PCA output
+        dimensions (int): 2 or 3
+        batch_size (int): Records read from Chroma at a time
+        pca_components (int): PCA dimensions fed to t-SNE/UMAP
+        sample_size (int): Points t-SNE/UMAP are run on
+        cache_dir (str): Where projections are cached, None to disable
+        seed (int): Seed for sampling and the manifold methods
+    Returns:
+        dict: "points" (n x dimensions), "ids" (utf-8 encoded Chroma ids), "labels" (codes
+            into "categories") and "categories" (doc_type names)
+    """
+    if method not in ("pca", "tsne", "umap"):
+        raise ValueError(f"Unknown projection method: {method}")
+
+    collection = open_collection(db_path, collection_name)
+    settings = {
+        "format": CACHE_FORMAT,
+        "version": collection_version(db_path, collection),
+        "method": method,
+        "dimensions": dimensions,
+        "pca_components": pca_components,
+        "sample_size": sample_size,
+        "seed": seed
+    }
+    cache_path = None
+    if cache_dir:
+        cache_key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{collection_name}-{cache_key}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return {key: cached[key] for key in ("points", "ids", "labels", "categories")}
+
+    count = collection.count()
+    if count == 0:
+        raise ValueError(f"Collection {collection_name} is empty")
+
+    # Plain PCA goes straight to the output dimensions, t-SNE/UMAP start from pca_components
+    components = min(dimensions if method == "pca" else pca_components, count)
+    pca = fit_incremental_pca(collection, components, batch_size)
+
+    # Documents are not read here; render() fetches previews for the points it draws
+    reduced, ids, labels, codes = [], [], [], {}
+    for batch in iter_batches(collection, batch_size, include=("embeddings", "metadatas")):
+        reduced.append(pca.transform(np.asarray(batch["embeddings"], dtype=np.float32)).astype(np.float32))
+        ids.append(np.char.encode(np.asarray(batch["ids"]), "utf-8"))
+        labels.append(np.fromiter(
+            (codes.setdefault((metadata or {}).get("doc_type", "unknown"), len(codes)) for metadata in batch["metadatas"]),
+            dtype=np.int32,
+            count=len(batch["ids"])
+        ))
+    reduced = np.concatenate(reduced)
+    ids = np.concatenate(ids)
+    labels = np.concatenate(labels)
+    categories = np.asarray(list(codes))
+
+    if method == "pca":
+        points = reduced
+    else:
+        # t-SNE and UMAP are super-linear, so they only see a sample
+        rng = np.random.default_rng(seed)
+        if len(reduced) > sample_size:
+            rows = np.sort(rng.choice(len(reduced), sample_size, replace=False))
+            reduced, ids, labels = reduced[rows], ids[rows], labels[rows]
+        if method == "tsne":
+            from sklearn.manifold import TSNE
+            points = TSNE(n_components=dimensions, random_state=seed, init="pca").fit_transform(reduced)
+        else:
+            try:
+                import umap
+            except ImportError:
+                raise ImportError("method='umap' needs the umap-learn package") from None
+            points = umap.UMAP(n_components=dimensions, random_state=seed).fit_transform(reduced)
+
+    projection = {
+        "points": np.asarray(points, dtype=np.float32),
+        "ids": ids,
+        "labels": labels,
+        "categories": categories
+    }
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, **projection)
+    return projection
+
+def render(projection, collection=None, max_points=200000, title="Chroma Vector Store", seed=42):
+    """
+    Plot a projection with one WebGL trace per doc_type
+    Args:
+        projection (dict): Output of project()
+        collection (chromadb.Collection, optional): Collection the projection came from; when
+            given, document previews are fetched for the drawn points and shown on hover
+        max_points (int): Points drawn; larger projections are randomly downsampled
+        title (str): Figure title
+    Returns:
+        plotly.graph_objects.Figure
+    """
+    import plotly.graph_objects as go
+
+    points, ids, labels = projection["points"], projection["ids"], projection["labels"]
+    if len(points) > max_points:
+        rows = np.sort(np.random.default_rng(seed).choice(len(points), max_points, replace=False))
+        points, ids, labels = points[rows], ids[rows], labels[rows]
+
+    if collection is not None:
+        previews = np.asarray(fetch_previews(collection, np.char.decode(ids, "utf-8").tolist()))
+    else:
+        previews = np.full(len(points), "")
+
+    fig = go.Figure()
+    for code in np.unique(labels):
+        label = projection["categories"][code]
+        mask = labels == code
+        if points.shape[1] == 3:
+            # Scatter3d is drawn with WebGL already
+            trace = go.Scatter3d(
+                x=points[mask, 0], y=points[mask, 1], z=points[mask, 2],
+                mode="markers", name=str(label), text=previews[mask], marker={"size": 2, "opacity": 0.7}
+            )
+        else:
+            trace = go.Scattergl(
+                x=points[mask, 0], y=points[mask, 1],
+                mode="markers", name=str(label), text=previews[mask], marker={"size": 3, "opacity": 0.7}
+            )
+        fig.add_trace(trace)
+
+    fig.update_layout(title=f"{title} ({len(points):,} of {len(projection['points']):,} points)")
+    return fig
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("db_name", "vector_db"), help="Chroma persist directory")
+    parser.add_argument("--collection", default="langchain")
+    parser.add_argument("--method", choices=["pca", "tsne", "umap"], default="pca")
+    parser.add_argument("--dimensions", type=int, choices=[2, 3], default=2)
+    parser.add_argument("--sample", type=int, default=20000, help="points t-SNE/UMAP are run on")
+    parser.add_argument("--max-points", type=int, default=200000, help="points drawn")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--out", help="write the figure to this HTML file instead of opening it")
+    args = parser.parse_args()
+
+    projection = project(
+        args.db,
+        args.collection,
+        method=args.method,
+        dimensions=args.dimensions,
+        batch_size=args.batch_size,
+        sample_size=args.sample
+    )
+    fig = render(
+        projection,
+        open_collection(args.db, args.collection),
+        max_points=args.max_points,
+        title=f"Chroma Vector Store ({args.method})"
+    )
+    if args.out:
+        fig.write_html(args.out)
+        print(f"Wrote {args.out}")
+    else:
+        fig.show()
+
+if __name__ == "__main__":
+    main()